@@ -0,0 +1,90 @@
+import polars as pl
+from collections import OrderedDict
+
+def format_frame(df) -> list:
+    """
+    Format every column of a block into display strings with one cast per column
+    """
+    columns = []
+    for series in df:
+        if series.dtype == pl.Boolean or series.dtype.is_nested() or series.dtype == pl.Object:
+            columns.append([str(value) for value in series.to_list()])
+            continue
+        columns.append(series.cast(pl.String).fill_null('None').to_list())
+    return columns
+
+class BlockCache:
+    """
+    LRU of formatted row blocks, so painting a cell is a list lookup instead of a
+    scalar dataframe index and string conversion
+    """
+
+    block_rows = 256
+    max_blocks = 64
+
+    def __init__(self, source, columns=None) -> None:
+        self.source = source
+        self.columns = columns
+        self.rows = None
+        self._blocks = OrderedDict()
+        # (first row, rows) of the row order window read last, for sources with a gather window
+        self._window = None
+
+    def set_columns(self, columns) -> None:
+        """
+        Change the formatted columns, the blocks are formatted again as they are viewed
+        """
+        self.columns = columns
+        self.clear()
+        return
+
+    def set_rows(self, rows) -> None:
+        """
+        Show the source rows in the given order, None shows them in table order
+        """
+        self.rows = rows
+        self.clear()
+        return
+
+    def clear(self) -> None:
+        self._blocks.clear()
+        self._window = None
+        return
+
+    def block(self, block) -> list:
+        """
+        Get the formatted columns of a block of rows
+        """
+        if block in self._blocks:
+            self._blocks.move_to_end(block)
+            return self._blocks[block]
+
+        start = block * self.block_rows
+        if self.rows is None:
+            df = self.source.slice(start, self.block_rows, self.columns)
+        elif self.source.gather_window:
+            df = self.window(start).slice(start % self.source.gather_window, self.block_rows)
+        else:
+            df = self.source.gather(self.rows[start:start + self.block_rows], self.columns)
+        self._blocks[block] = format_frame(df)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return self._blocks[block]
+
+    def window(self, start) -> pl.DataFrame:
+        """
+        Rows of the window of the row order a block starts in. Sources that scan for scattered rows
+        read the whole window in one pass, instead of scanning the table again for every block
+        """
+        size = self.source.gather_window
+        first = start - start % size
+        if self._window is None or self._window[0] != first:
+            self._window = (first, self.source.gather(self.rows[first:first + size], self.columns))
+        return self._window[1]
+
+    def text(self, row, column) -> str:
+        """
+        Display text of a cell, column is the position in the formatted columns
+        """
+        block, offset = divmod(row, self.block_rows)
+        return self.block(block)[column][offset]
@@ -0,0 +1,163 @@
+import numpy as np
+import polars as pl
+
+# Local import
+import Local_DB_Viwer.query_parser as query_parser
+
+class HashIndex:
+    """
+    Rows of every distinct value of a text column. Values are kept sorted and lowercased,
+    since searches ignore case, so an equality lookup is one binary search
+    """
+
+    def __init__(self, values, starts, order, height) -> None:
+        self.values = values
+        self.starts = starts
+        self.order = order
+        self.height = height
+
+    @classmethod
+    def build(cls, series) -> 'HashIndex':
+        """
+        Sort the rows by value once, each value then owns a run of the sorted rows in table order
+        """
+        lowered = series.cast(pl.String).str.to_lowercase()
+        present = len(lowered) - lowered.null_count()
+        order = (lowered.to_frame()
+                 .select(pl.arg_sort_by(lowered.name, nulls_last=True, maintain_order=True))
+                 .to_series().cast(pl.Int64).to_numpy()[:present])
+
+        ordered = lowered.gather(order)
+        values = ordered.unique(maintain_order=True)
+        starts = np.append(ordered.search_sorted(values, side='left').cast(pl.Int64).to_numpy(), present)
+        return cls(values, starts, order, len(series))
+
+    def lookup(self, value) -> np.ndarray:
+        """
+        Rows holding a value, in table order
+        """
+        position = self.values.search_sorted(value)
+        if position >= len(self.values) or self.values[position] != value:
+            return np.empty(0, dtype=np.int64)
+        return self.order[self.starts[position]:self.starts[position + 1]]
+
+    def candidates(self, op, value) -> np.ndarray:
+        """
+        Rows an equality or `in` condition matches, None for conditions the index can not answer
+        """
+        match op:
+            case '=':
+                return self.lookup(value)
+            case 'in':
+                return union([self.lookup(item) for item in value], self.height)
+        return None
+
+class ZoneMap:
+    """
+    Lowest and highest value of every block of rows of a numeric or date column.
+    A range condition only needs to look at the blocks whose range it overlaps
+    """
+
+    block_rows = 65_536
+
+    def __init__(self, low, high, height) -> None:
+        self.low = low
+        self.high = high
+        self.height = height
+
+    @classmethod
+    def build(cls, series) -> 'ZoneMap':
+        """
+        Work out the block ranges in one grouped pass. NaN compares above every number,
+        so blocks holding one are open ended at the top. Bounds of small number types are kept
+        as Int64 or Float64, so searched values outside the range of the column still compare
+        """
+        column = pl.col(series.name)
+        if series.dtype.is_integer() and series.dtype != pl.UInt64:
+            column = column.cast(pl.Int64)
+        elif series.dtype.is_float():
+            column = column.cast(pl.Float64)
+        low, high = column, column
+        if series.dtype.is_float():
+            low, high = column.fill_nan(None), column.fill_nan(float('inf'))
+
+        zones = (series.to_frame()
+                 .with_row_index('__row')
+                 .group_by(pl.col('__row') // cls.block_rows, maintain_order=True)
+                 .agg(low.min().alias('low'), high.max().alias('high')))
+        return cls(zones['low'], zones['high'], len(series))
+
+    def blocks(self, op, value) -> pl.Series:
+        """
+        Flag the blocks a condition can match rows in
+        """
+        match op:
+            case '=':
+                return (self.low <= value) & (self.high >= value)
+            case '>':
+                return self.high > value
+            case '>=':
+                return self.high >= value
+            case '<':
+                return self.low < value
+            case '<=':
+                return self.low <= value
+            case 'between':
+                return (self.high >= value[0]) & (self.low <= value[1])
+            case 'in':
+                flags = pl.Series([False] * len(self.low))
+                for item in value:
+                    flags = flags | self.blocks('=', item).fill_null(False)
+                return flags
+        return None
+
+    def candidates(self, op, value) -> np.ndarray:
+        """
+        Rows of the blocks a condition can match, None when every block has to be read anyway
+        """
+        flags = self.blocks(op, value)
+        if flags is None:
+            return None
+        blocks = np.flatnonzero(flags.fill_null(False).to_numpy())
+        if len(blocks) == len(flags):
+            return None
+
+        rows = [np.arange(block * self.block_rows, min((block + 1) * self.block_rows, self.height))
+                for block in blocks]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+def intersect(found, height) -> np.ndarray:
+    """
+    Rows in every one of the row arrays, counted in one flag array instead of sorting them together
+    """
+    if len(found) == 1:
+        return found[0]
+    counts = np.zeros(height, dtype=np.int32)
+    for rows in found:
+        counts[rows] += 1
+    return np.flatnonzero(counts == len(found))
+
+def union(found, height) -> np.ndarray:
+    """
+    Rows in any of the row arrays, in table order
+    """
+    if len(found) == 1:
+        return found[0]
+    flags = np.zeros(height, dtype=bool)
+    for rows in found:
+        flags[rows] = True
+    return np.flatnonzero(flags)
+
+def indexable(dtype) -> bool:
+    """
+    Columns that get a secondary index: text for equality, numbers and dates for ranges
+    """
+    return query_parser.is_text(dtype) or dtype.is_numeric() or dtype.is_temporal()
+
+def build(series) -> object:
+    """
+    Index that fits the type of a column
+    """
+    if query_parser.is_text(series.dtype):
+        return HashIndex.build(series)
+    return ZoneMap.build(series)
@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import threading
+import polars as pl
+
+class CsvCache:
+    """
+    Columnar cache of parsed csvs, stored as uncompressed Arrow IPC files so reopening them is memory-mapped
+    """
+
+    user_path = os.path.expanduser("~")
+    cache_folder = os.path.join(user_path, "MAPS-Python", "CSV Cache")
+    max_bytes = 20 * 1024 ** 3
+    version = 1
+
+    _lock = threading.Lock()
+    # Cached files open tables still scan, counted per path so eviction leaves them alone
+    _in_use = {}
+
+    def __init__(self, cache_folder=None, max_bytes=None) -> None:
+        self.cache_folder = cache_folder or self.cache_folder
+        self.max_bytes = max_bytes if max_bytes is not None else self.max_bytes
+
+    def cache_key(self, file_path, options) -> str:
+        """
+        Key the cached copy on the file path, size, modified time and the load options
+        """
+        stat = os.stat(file_path)
+        key = json.dumps([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+                          options, self.version], sort_keys=True)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def cache_path(self, key) -> str:
+        """
+        Location of the cached copy
+        """
+        return os.path.join(self.cache_folder, f"{key}.arrow")
+
+    def path(self, file_path, options) -> str:
+        """
+        Location of the cached copy of a file loaded with the given options
+        """
+        return self.cache_path(self.cache_key(file_path, options))
+
+    def load(self, file_path, options) -> pl.LazyFrame:
+        """
+        Scan the cached copy of the file if there is one, touching it so it counts as recently used
+        """
+        path = self.path(file_path, options)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            os.utime(path)
+            return pl.scan_ipc(path)
+        except OSError:
+            return None
+
+    def store(self, file_path, data, options) -> pl.LazyFrame:
+        """
+        Write the parsed file to the cache and hand back a scan of the cached copy.
+        LazyFrames are streamed to disk so the file is never fully collected
+        """
+        path = self.path(file_path, options)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            if isinstance(data, pl.LazyFrame):
+                data.sink_ipc(temp_path, compression='uncompressed')
+            else:
+                data.write_ipc(temp_path, compression='uncompressed')
+            os.replace(temp_path, path)
+        except OSError:
+            # Cache folder not writable or out of disk, the file is loaded without caching
+            self.remove_temp(temp_path)
+            return None
+        except Exception:
+            self.remove_temp(temp_path)
+            raise
+
+        self.evict(keep=path)
+        return pl.scan_ipc(path)
+
+    def remove_temp(self, temp_path) -> None:
+        """
+        Clean up a partially written cache file
+        """
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+
+    @classmethod
+    def hold(cls, paths) -> None:
+        """
+        Mark cached files as scanned by an open table, they are not evicted until released
+        """
+        with cls._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                cls._in_use[path] = cls._in_use.get(path, 0) + 1
+        return
+
+    @classmethod
+    def release(cls, paths) -> None:
+        """
+        A table scanning the cached files was closed
+        """
+        with cls._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                cls._in_use[path] = cls._in_use.get(path, 0) - 1
+                if cls._in_use[path] <= 0:
+                    del cls._in_use[path]
+        return
+
+    def evict(self, keep=None) -> None:
+        """
+        Remove the least recently used cached files until the cache fits in the disk budget.
+        Files open tables scan are skipped, removing them would break the next page read
+        """
+        with self._lock:
+            entries = []
+            for file in os.listdir(self.cache_folder):
+                path = os.path.join(self.cache_folder, file)
+                if file.endswith('.arrow') and path != keep and os.path.abspath(path) not in self._in_use:
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            if keep is not None and os.path.exists(keep):
+                total += os.path.getsize(keep)
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    # Still mapped by a collected table on some platforms
+                    continue
+        return
+
+    def clear(self) -> None:
+        """
+        Remove every cached file that no open table scans
+        """
+        with self._lock:
+            if os.path.isdir(self.cache_folder):
+                for file in os.listdir(self.cache_folder):
+                    path = os.path.join(self.cache_folder, file)
+                    if file.endswith('.arrow') and os.path.abspath(path) not in self._in_use:
+                        os.remove(path)
+        return
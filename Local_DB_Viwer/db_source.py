@@ -0,0 +1,528 @@
+import os
+import re
+import math
+import functools
+import threading
+import numpy as np
+import polars as pl
+from collections import OrderedDict
+from polars.io.plugins import register_io_source
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+# Local import
+import Local_DB_Viwer.table_source as table_source
+import Local_DB_Viwer.query_parser as query_parser
+
+_engines = {}
+_engine_lock = threading.Lock()
+
+def get_engine(file_path):
+    """
+    One pooled engine per database file, shared by every table and drop of that file
+    """
+    path = os.path.abspath(file_path)
+    with _engine_lock:
+        if path not in _engines:
+            engine = create_engine(f"sqlite:///{path}")
+            event.listen(engine, 'connect', add_functions)
+            _engines[path] = engine
+        return _engines[path]
+
+@functools.lru_cache(maxsize=256)
+def compiled_regex(pattern) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE)
+
+def regexp(pattern, value) -> bool:
+    """
+    SQLite calls `value REGEXP pattern` as regexp(pattern, value), matching ignores case like the other searches
+    """
+    if value is None:
+        return None
+    return compiled_regex(pattern).search(str(value)) is not None
+
+def add_functions(dbapi_connection, connection_record) -> None:
+    """
+    Give every new connection the REGEXP function, SQLite only has the operator
+    """
+    dbapi_connection.create_function('REGEXP', 2, regexp, deterministic=True)
+    return
+
+def close_engine(file_path) -> None:
+    """
+    Release the pooled connections of a database file
+    """
+    with _engine_lock:
+        engine = _engines.pop(os.path.abspath(file_path), None)
+    if engine is not None:
+        engine.dispose()
+    return
+
+def table_names(file_path) -> list:
+    """
+    Get the tables found in the database file
+    """
+    return inspect(get_engine(file_path)).get_table_names()
+
+def quote(name) -> str:
+    """
+    Quote a SQL identifier
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+class SQLiteSource(table_source.FrameSource):
+    """
+    Table source that pages rows out of a SQLite table as they are viewed, pages are found
+    with keyset pagination on the rowid so scrolling deep into the table stays cheap
+    """
+
+    page_rows = 500
+    max_pages = 32
+    # Rows read at a time when the whole table is scanned
+    chunk_rows = 100_000
+    # Rowids looked up per query when gathering scattered rows
+    gather_batch = 10_000
+    # SQLite instructions run between two checks of a search cancel token
+    progress_steps = 10_000
+    pushdown = True
+
+    def __init__(self, file_path, table_name, aliases=None, height=None) -> None:
+        self.file_path = file_path
+        self.table_name = table_name
+        self.engine = get_engine(file_path)
+        self.table = quote(table_name)
+
+        self._pages = OrderedDict()
+        self._boundaries = {0: None}
+        self._schema = None
+        self._rowids = None
+        self._lock = threading.Lock()
+        self.init_caches()
+
+        self.sql_columns = [column['name'] for column in inspect(self.engine).get_columns(table_name)]
+        self.add_index = 'Index' not in self.sql_columns
+        self.has_rowid = self.check_rowid()
+        self._height = height if height is not None else self.count_rows()
+        self._base = self.rowid_base() if self.has_rowid else None
+
+        # Display name of each column, the viewer lowercases them
+        columns = (['Index'] if self.add_index else []) + self.sql_columns
+        self.aliases = aliases or {column: column for column in columns}
+        self._schema = self.page(0).drop('__rowid').schema if self._height else \
+            pl.Schema({name: pl.String for name in self.aliases.values()})
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def columns(self) -> list:
+        return list(self.aliases.values())
+
+    @property
+    def schema(self) -> pl.Schema:
+        return self._schema
+
+    def rename(self, mapping) -> 'SQLiteSource':
+        """
+        Rename the displayed columns, the SQL columns stay the same
+        """
+        aliases = {column: mapping.get(name, name) for column, name in self.aliases.items()}
+        return SQLiteSource(self.file_path, self.table_name, aliases, self._height)
+
+    def check_rowid(self) -> bool:
+        """
+        Tables created WITHOUT ROWID fall back to offset paging
+        """
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text(f"SELECT rowid FROM {self.table} LIMIT 1"))
+            return True
+        except OperationalError:
+            return False
+
+    def count_rows(self) -> int:
+        """
+        Row count of the table
+        """
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {self.table}")).scalar()
+
+    def page_start(self, page) -> int:
+        """
+        Rowid the page starts after. Contiguous rowids are worked out directly, otherwise
+        unknown pages seek from the closest known page on the rowid only
+        """
+        if self._base is not None:
+            return self._base + page * self.page_rows - 1 if page else None
+
+        with self._lock:
+            if page in self._boundaries:
+                return self._boundaries[page]
+            known = max(p for p in self._boundaries if p < page)
+            after = self._boundaries[known]
+
+        query = f"SELECT rowid FROM {self.table} WHERE rowid > :after ORDER BY rowid LIMIT 1 OFFSET :skip"
+        with self.engine.connect() as conn:
+            start = conn.execute(text(query), {'after': -2 ** 63 if after is None else after,
+                                               'skip': (page - known) * self.page_rows - 1}).scalar()
+        # Pages past the end have no start, they are not remembered as starting at the first row
+        if start is not None:
+            with self._lock:
+                self._boundaries[page] = start
+        return start
+
+    def fetch_page(self, page) -> pl.DataFrame:
+        """
+        Query a single page of rows out of the database, pages past the end are empty
+        """
+        columns = ', '.join(quote(column) for column in self.sql_columns)
+        if self.has_rowid:
+            after = self.page_start(page) if 0 <= page * self.page_rows < self._height else None
+            query = f"SELECT rowid, {columns} FROM {self.table} WHERE rowid > :after ORDER BY rowid LIMIT :limit"
+            params = {'after': -2 ** 63 if after is None else after, 'limit': self.page_rows}
+        else:
+            query = f"SELECT NULL, {columns} FROM {self.table} LIMIT :limit OFFSET :offset"
+            params = {'limit': self.page_rows, 'offset': page * self.page_rows}
+
+        # Only the first page starts before every rowid, a missing start is past the end of the table
+        rows = []
+        if page == 0 or not self.has_rowid or after is not None:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(query), params).fetchall()
+
+        df = pl.DataFrame(rows, schema=['__rowid'] + self.sql_columns, orient='row', infer_schema_length=None)
+        if self.has_rowid and rows:
+            with self._lock:
+                self._boundaries[page + 1] = rows[-1][0]
+
+        if self.add_index:
+            offset = page * self.page_rows
+            df = df.with_columns(pl.int_range(offset, offset + df.height, dtype=pl.Int64).alias('Index'))
+        return df.select(['__rowid'] + list(self.aliases)).rename(self.aliases)
+
+    def page(self, page) -> pl.DataFrame:
+        """
+        Get a page of rows, recently viewed pages are kept around
+        """
+        with self._lock:
+            if page in self._pages:
+                self._pages.move_to_end(page)
+                return self._pages[page]
+
+        df = self.fetch_page(page)
+        if self._schema is not None:
+            df = df.cast(self.page_dtypes(df), strict=False)
+
+        with self._lock:
+            self._pages[page] = df
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return df
+
+    def page_dtypes(self, df) -> dict:
+        """
+        Keep page dtypes in line with the first page, SQLite columns are not strictly typed
+        """
+        return {name: dtype for name, dtype in self._schema.items()
+                if df.schema[name] != dtype and dtype != pl.Null}
+
+    def estimated_size(self) -> int:
+        """
+        Memory of the cached pages, the rest of the table stays in the database
+        """
+        with self._lock:
+            return sum(df.estimated_size() for df in self._pages.values())
+
+    def spill(self, path) -> bool:
+        """
+        Drop the cached pages, they are read again from the database when viewed
+        """
+        with self._lock:
+            self._pages.clear()
+        return False
+
+    def release_caches(self) -> None:
+        """
+        Drop the cached pages and everything worked out for the table once no view shows it
+        """
+        with self._lock:
+            self._pages.clear()
+        self.drop_indexes()
+        return
+
+    def cell(self, row, column) -> object:
+        """
+        Get a single value from the page the row belongs to
+        """
+        page, offset = divmod(row, self.page_rows)
+        df = self.page(page)
+        if isinstance(column, int):
+            column += 1
+        return df[offset, column]
+
+    def slice(self, offset, length, columns=None) -> pl.DataFrame:
+        """
+        Get a block of rows from the pages that cover it
+        """
+        length = max(0, min(length, self._height - offset))
+        first, last = offset // self.page_rows, (offset + length - 1) // self.page_rows
+        if not length:
+            return pl.DataFrame(schema=self._schema).select(columns or self.columns)
+
+        df = pl.concat([self.page(page) for page in range(first, last + 1)], how='vertical_relaxed')
+        df = df.slice(offset - first * self.page_rows, length)
+        return df.select(columns if columns is not None else self.columns)
+
+    def gather(self, rows, columns=None) -> pl.DataFrame:
+        """
+        Get the rows at the given positions. Rows from a few pages come out of the page cache,
+        scattered rows are looked up by rowid so a sorted view reads only the rows it shows
+        """
+        columns = columns if columns is not None else self.columns
+        if not len(rows):
+            return pl.DataFrame(schema=self._schema).select(columns)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        pages = np.unique(rows // self.page_rows)
+        if self.has_rowid and len(pages) > self.max_pages // 2:
+            wanted = np.unique(rows)
+            return self.fetch_rows(wanted, columns)[np.searchsorted(wanted, rows)]
+
+        frames = [self.page(int(page)).with_row_index('__pos', offset=int(page) * self.page_rows)
+                  for page in pages]
+        df = pl.concat(frames, how='vertical_relaxed')
+
+        positions = pl.DataFrame({'__pos': pl.Series(rows, dtype=df.schema['__pos'])})
+        return positions.join(df, on='__pos', how='left', maintain_order='left').select(columns)
+
+    def fetch_rows(self, positions, columns) -> pl.DataFrame:
+        """
+        Query the rows at sorted positions by their rowids, a batch of rowids per query
+        """
+        rowids = positions + self._base if self._base is not None else \
+            self.rowid_index().gather(positions).to_numpy()
+        names = {alias: column for column, alias in self.aliases.items()}
+        sql_columns = list(dict.fromkeys(names[name] for name in columns if names[name] in self.sql_columns))
+        select = ', '.join(['rowid'] + [quote(column) for column in sql_columns])
+
+        rows = []
+        with self.engine.connect() as conn:
+            for start in range(0, len(rowids), self.gather_batch):
+                # Rowids are integers from the table, they go into the query as they are
+                batch = ', '.join(str(int(rowid)) for rowid in rowids[start:start + self.gather_batch])
+                rows += conn.execute(text(f"SELECT {select} FROM {self.table} WHERE rowid IN ({batch})")).fetchall()
+
+        df = pl.DataFrame(rows, schema=['__rowid'] + sql_columns, orient='row', infer_schema_length=None)
+        found = pl.DataFrame({'__rowid': pl.Series(rowids, dtype=pl.Int64), '__pos': positions})
+        df = found.join(df.cast({'__rowid': pl.Int64}), on='__rowid', how='left', maintain_order='left')
+        if self.add_index:
+            df = df.with_columns(pl.col('__pos').alias('Index'))
+
+        df = df.rename({column: alias for column, alias in self.aliases.items() if column in df.columns})
+        return df.select(columns).cast({name: self._schema[name] for name in columns
+                                        if self._schema[name] != pl.Null}, strict=False)
+
+    def chunks(self, columns=None):
+        """
+        Read the table in order a chunk at a time. Each chunk seeks past the last rowid of
+        the one before, so reading deep into the table does not read the rows before it again
+        """
+        columns = columns if columns is not None else self.columns
+        names = {alias: column for column, alias in self.aliases.items()}
+        sql_columns = list(dict.fromkeys(names[name] for name in columns if names[name] in self.sql_columns))
+        select = ', '.join(['rowid' if self.has_rowid else 'NULL'] + [quote(column) for column in sql_columns])
+
+        after, offset = -2 ** 63, 0
+        while True:
+            if self.has_rowid:
+                query = f"SELECT {select} FROM {self.table} WHERE rowid > :after ORDER BY rowid LIMIT :limit"
+                params = {'after': after, 'limit': self.chunk_rows}
+            else:
+                query = f"SELECT {select} FROM {self.table} LIMIT :limit OFFSET :offset"
+                params = {'limit': self.chunk_rows, 'offset': offset}
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(query), params).fetchall()
+            if not rows:
+                return
+
+            df = pl.DataFrame(rows, schema=['__rowid'] + sql_columns, orient='row', infer_schema_length=None)
+            if self.add_index:
+                df = df.with_columns(pl.int_range(offset, offset + df.height, dtype=pl.Int64).alias('Index'))
+            after, offset = rows[-1][0], offset + len(rows)
+
+            df = df.rename({column: alias for column, alias in self.aliases.items() if column in df.columns})
+            yield df.select(columns).cast({name: self._schema[name] for name in columns
+                                           if self._schema[name] != pl.Null}, strict=False)
+
+    def lazy(self) -> pl.LazyFrame:
+        """
+        Lazy scan of the table read in rowid chunks, only the selected columns are read and filters
+        pushed into the scan are applied chunk by chunk. Searches run inside SQLite, this is for
+        callers that need a LazyFrame and it never loads the whole table at once
+        """
+        def scan(with_columns, predicate, n_rows, batch_size):
+            for df in self.chunks(with_columns):
+                if predicate is not None:
+                    df = df.filter(predicate)
+                if n_rows is not None:
+                    df = df.head(n_rows)
+                    n_rows -= df.height
+                yield df
+                if n_rows is not None and n_rows <= 0:
+                    return
+
+        return register_io_source(scan, schema=self._schema)
+
+    def column_frame(self, columns) -> pl.DataFrame:
+        """
+        Read only the given columns of the whole table, in table order
+        """
+        names = {alias: column for column, alias in self.aliases.items()}
+        sql_columns = [names[name] for name in columns if names[name] in self.sql_columns]
+        order = "ORDER BY rowid" if self.has_rowid else ""
+
+        df = pl.DataFrame()
+        if sql_columns:
+            select = ', '.join(quote(column) for column in dict.fromkeys(sql_columns))
+            df = pl.read_database(query=f"SELECT {select} FROM {self.table} {order}", connection=self.engine,
+                                  infer_schema_length=None)
+        if self.add_index and 'Index' in [names[name] for name in columns]:
+            index = pl.DataFrame({'Index': pl.int_range(0, self._height, dtype=pl.Int64, eager=True)})
+            df = pl.concat([df, index], how='horizontal')
+        return df.rename({column: alias for column, alias in self.aliases.items() if column in df.columns})\
+                 .select(columns)
+
+    def normalized(self) -> pl.LazyFrame:
+        """
+        Searches are run by SQLite, this lowercases the chunked scan for the odd search run in Polars
+        """
+        return table_source.lowercase(self.lazy())
+
+    def prepare_search(self) -> None:
+        return
+
+    def rowid_base(self) -> int:
+        """
+        First rowid when the rowids run without gaps, so a row position is just rowid - base
+        """
+        with self.engine.connect() as conn:
+            low, high = conn.execute(text(f"SELECT MIN(rowid), MAX(rowid) FROM {self.table}")).one()
+        if low is not None and high - low + 1 == self._height:
+            return low
+        return None
+
+    def rowid_index(self) -> pl.Series:
+        """
+        Every rowid in order, only loaded when the rowids have gaps in them
+        """
+        if self._rowids is None:
+            df = pl.read_database(query=f"SELECT rowid FROM {self.table} ORDER BY rowid", connection=self.engine)
+            self._rowids = df.to_series()
+        return self._rowids
+
+    def search(self, query, token=None) -> tuple:
+        """
+        Run the compiled search inside SQLite so the table indexes are used. Returns the matched row
+        positions and the positions each searched column matched on, the table never gets loaded into memory.
+        Errors SQLite runs into, like a locked database, come back as a QueryError. SQLite checks the
+        cancel token while the query runs and interrupts it once the token is cancelled
+        """
+        node, conditions = query.node, query.conditions
+        base = self._base
+        index_name = self.aliases.get('Index') if self.add_index else None
+        columns = {alias: quote(column) for column, alias in self.aliases.items() if alias != index_name}
+
+        # Filter on the table itself so SQLite can use its indexes, row positions are only worked out
+        # for the matched rowids. Without rowids the rows can only be numbered by counting them in SQL
+        if self.has_rowid and (base is not None or index_name not in query.columns
+                               or self.index_searchable(query, index_name)):
+            table, key = self.table, "rowid"
+            if index_name is not None:
+                columns[index_name] = f"(rowid - {int(base)})" if base is not None else self.index_sql
+        else:
+            order = "ORDER BY rowid" if self.has_rowid else ""
+            table, key = f"(SELECT ROW_NUMBER() OVER ({order}) - 1 AS __pos, * FROM {self.table})", "__pos"
+            if index_name is not None:
+                columns[index_name] = "__pos"
+
+        params = {}
+        where, _ = query_parser.to_sql(node, columns, params, query.resolve)
+        flags = [query_parser.to_sql(cond, columns, params, query.resolve)[0] for cond in conditions]
+
+        select = ', '.join([f"{key} AS __key"] + [f"({flag}) AS __hit{idx}" for idx, flag in enumerate(flags)])
+        sql = f"SELECT {select} FROM {table} WHERE {where} ORDER BY __key"
+        try:
+            with self.engine.connect() as conn:
+                driver = conn.connection.driver_connection
+                if token is not None:
+                    driver.set_progress_handler(token.cancelled, self.progress_steps)
+                try:
+                    df = pl.read_database(query=text(sql), connection=conn,
+                                          execute_options={'parameters': params}, infer_schema_length=None)
+                finally:
+                    driver.set_progress_handler(None, 0)
+            df = df.with_columns(self.positions(df['__key'].cast(pl.Int64), key, base).alias('__pos'))
+        except DBAPIError as e:
+            raise query_parser.QueryError(f"SQLite could not run the search: {e.orig}")
+
+        hits = {}
+        for idx, (column, _) in enumerate(query.flags):
+            matched = df.filter(pl.col(f"__hit{idx}") == 1)['__pos']
+            hits[column] = matched if column not in hits else pl.concat([hits[column], matched]).unique().sort()
+        return df['__pos'], hits
+
+    def index_searchable(self, query, index_name) -> bool:
+        """
+        Check if every condition on the row number compares it to numbers, those are turned into rowid ranges
+        """
+        for cond in query.conditions:
+            if query.resolve(cond.column) != index_name:
+                continue
+            values = cond.value if cond.op in ('in', 'between') else [cond.value]
+            if cond.op not in ('=', '!=', '>', '<', '>=', '<=', 'in', 'between') \
+                    or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+                return False
+        return True
+
+    def index_sql(self, node, bind) -> str:
+        """
+        Condition on the row number of a table whose rowids have gaps. Row numbers follow the rowids,
+        so a range of row numbers is a range of rowids and SQLite can seek on the rowid
+        """
+        rowids, height = self.rowid_index(), self._height
+
+        if node.op == 'in':
+            found = [rowids[int(value)] for value in node.value if float(value).is_integer() and 0 <= value < height]
+            sql = f"rowid IN ({', '.join(bind(rowid) for rowid in found)})" if found else "0"
+        else:
+            # Row numbers low up to but not including high
+            value = node.value
+            match node.op:
+                case '=' | '!=':
+                    low, high = math.ceil(value), math.floor(value) + 1
+                case '>':
+                    low, high = math.floor(value) + 1, height
+                case '>=':
+                    low, high = math.ceil(value), height
+                case '<':
+                    low, high = 0, math.ceil(value)
+                case '<=':
+                    low, high = 0, math.floor(value) + 1
+                case 'between':
+                    low, high = math.ceil(value[0]), math.floor(value[1]) + 1
+            low, high = max(low, 0), min(high, height)
+            sql = f"rowid BETWEEN {bind(rowids[low])} AND {bind(rowids[high - 1])}" if low < high else "0"
+            if node.op == '!=':
+                sql = f"NOT ({sql})"
+        return f"NOT ({sql})" if node.negate else sql
+
+    def positions(self, keys, key, base) -> pl.Series:
+        """
+        Turn matched rowids into row positions of the table
+        """
+        if key != "rowid":
+            return keys
+        if base is not None:
+            return keys - base
+        return self.rowid_index().search_sorted(keys).cast(pl.Int64)
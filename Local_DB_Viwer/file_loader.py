@@ -0,0 +1,163 @@
+import os
+import threading
+import polars as pl
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Local import
+import Local_DB_Viwer.table_source as table_source
+import Local_DB_Viwer.db_source as db_source
+import Local_DB_Viwer.type_optimizer as type_optimizer
+
+def add_index(data) -> pl.DataFrame:
+    """
+    Add index column if it does not exist
+    """
+    if isinstance(data, pl.LazyFrame):
+        if 'Index' not in data.collect_schema().names():
+            return data.with_row_index('Index')
+        return data
+
+    if 'Index' not in data.columns:
+        df = pl.DataFrame({'Index': range(data.height)}).hstack(data)
+        return df
+    return data
+
+def read_csv(file_path, lazy=False, cache=None, typed=False, report=None) -> list:
+    """
+    Parse a single csv into a dataframe, polars spreads the parsing over its own thread pool.
+    Lazy files are only scanned, rows get collected when the table shows them.
+    Typed files store each column in the smallest type that holds it, `report` gets the memory it saved
+    """
+    csv_name = os.path.splitext(os.path.basename(file_path))[0]
+    options = {'index': 'Index', 'typed': typed}
+    data = cache.load(file_path, options) if cache is not None else None
+    cached = data is not None
+
+    if data is None:
+        data = add_index(pl.scan_csv(file_path))
+        if typed:
+            data, before, after = type_optimizer.optimize(data)
+            if report is not None and before:
+                report(csv_name, before, after)
+
+        # Parse once into the columnar cache and read the memory-mapped copy from then on
+        if cache is not None:
+            stored = cache.store(file_path, data, options)
+            cached = stored is not None
+            data = stored if cached else data
+
+    if lazy:
+        # Lazy tables keep scanning the cached copy, it is held so eviction does not remove it
+        files = [cache.path(file_path, options)] if cached else []
+        return [(table_source.LazySource(data, files=files), csv_name)]
+    return [(data.collect(), csv_name)]
+
+def read_db(file_path) -> list:
+    """
+    Open every table found in a SQL Lite database file, rows are paged in as they are viewed
+    """
+    return [(db_source.SQLiteSource(file_path, table_name), table_name)
+            for table_name in db_source.table_names(file_path)]
+
+def read_file(file_path, lazy=False, cache=None, typed=False, report=None) -> list:
+    """
+    Dispatch the file to the right reader based on the extension
+    """
+    if file_path.endswith('.db'):
+        return read_db(file_path)
+    return read_csv(file_path, lazy, cache, typed, report)
+
+class FileLoader(QThread):
+    """
+    Loader thread that parses the selected files concurrently and streams each table back as it finishes
+    """
+    table_loaded = pyqtSignal(object, str)
+    file_finished = pyqtSignal(int, int)
+    file_failed = pyqtSignal(str, str)
+    table_typed = pyqtSignal(str, int, int)
+
+    max_workers = min(4, os.cpu_count() or 1)
+    lazy_threshold = 1024 ** 3
+    # Seconds between checks for a cancel while files are being parsed
+    poll_interval = 0.1
+
+    def __init__(self, file_paths, lazy=False, cache=None, typed=False) -> None:
+        super().__init__()
+        self.file_paths = file_paths
+        self.lazy = lazy
+        self.cache = cache
+        self.typed = typed
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Stop handing out new files, results of files still being parsed are dropped
+        """
+        self._cancel.set()
+        return
+
+    def is_cancelled(self) -> bool:
+        """
+        Check if the user cancelled the loading
+        """
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        """
+        Parse the files on a worker pool and emit each table as soon as it is ready.
+        The cancel flag is checked while waiting, files finishing after a cancel are dropped
+        """
+        total_files = len(self.file_paths)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {executor.submit(self.load_file, path): path for path in self.file_paths}
+        pending, done_files = set(futures), 0
+
+        try:
+            while pending and not self.is_cancelled():
+                finished, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if self.is_cancelled():
+                        break
+
+                    file_path = futures[future]
+                    try:
+                        tables = future.result()
+                    except UnicodeDecodeError:
+                        tables = self.failed_file(file_path, f"Error decoding file {file_path}.")
+                    except Exception as e:
+                        tables = self.failed_file(file_path, f"An error occurred while processing {file_path}: {e}")
+
+                    done_files += 1
+                    for df, table_name in tables:
+                        self.table_loaded.emit(df, table_name)
+                    self.file_finished.emit(done_files, total_files)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return
+
+    def load_file(self, file_path) -> list:
+        """
+        Worker side of the pool, skips the file if loading was cancelled before it started
+        and lets go of the parsed tables if it was cancelled while parsing
+        """
+        if self.is_cancelled():
+            return []
+        tables = read_file(file_path, self.is_lazy(file_path), self.cache, self.typed, self.table_typed.emit)
+        if self.is_cancelled():
+            return []
+        return tables
+
+    def is_lazy(self, file_path) -> bool:
+        """
+        Files over the size threshold are scanned lazily instead of collected
+        """
+        return self.lazy or os.path.getsize(file_path) >= self.lazy_threshold
+
+    def failed_file(self, file_path, message) -> list:
+        """
+        Report the failed file and hand back an empty table so the user can still see it
+        """
+        self.file_failed.emit(file_path, message)
+        csv_name = os.path.splitext(os.path.basename(file_path))[0]
+        return [(pl.DataFrame(), csv_name)]
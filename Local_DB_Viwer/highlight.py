@@ -0,0 +1,65 @@
+import numpy as np
+
+class HighlightMask:
+    """
+    Highlighted cells of a table, kept as one packed bitmap of rows per column so
+    painting a cell is an O(1) bit lookup no matter how many cells were found
+    """
+
+    def __init__(self, height=0) -> None:
+        self.height = height
+        self.bits = {}
+
+    @classmethod
+    def from_rows(cls, height, hits) -> 'HighlightMask':
+        """
+        Build the mask from the matched row positions of each column
+        """
+        mask = cls(height)
+        for column, rows in hits.items():
+            mask.set_rows(column, rows)
+        return mask
+
+    def set_rows(self, column, rows) -> None:
+        """
+        Mark the rows of a column as highlighted, adding to what is already marked.
+        Only the bytes between the lowest and highest row are unpacked, so adding a block of hits
+        costs the size of the block and not of the table
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[(rows >= 0) & (rows < self.height)]
+
+        bits = self.bits.get(column)
+        if bits is None:
+            bits = self.bits[column] = np.zeros((self.height + 7) >> 3, dtype=np.uint8)
+        if not len(rows):
+            return
+
+        low, high = int(rows.min()) >> 3, (int(rows.max()) >> 3) + 1
+        flags = np.zeros((high - low) * 8, dtype=bool)
+        flags[rows - low * 8] = True
+        bits[low:high] |= np.packbits(flags)
+        return
+
+    def contains(self, row, column) -> bool:
+        """
+        Check if a single cell is highlighted
+        """
+        bits = self.bits.get(column)
+        if bits is None or not 0 <= row < self.height:
+            return False
+        return bool(bits[row >> 3] & (0x80 >> (row & 7)))
+
+    def rows(self, column) -> np.ndarray:
+        """
+        Row positions highlighted in a column
+        """
+        if column not in self.bits:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.unpackbits(self.bits[column], count=self.height))
+
+    def columns(self) -> list:
+        return list(self.bits)
+
+    def is_empty(self) -> bool:
+        return not self.bits
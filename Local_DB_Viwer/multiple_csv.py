@@ -1,12 +1,13 @@
 import os
 import sys
-import polars as pl
-from sqlalchemy import create_engine, MetaData
 from PyQt5.QtWidgets import QPushButton, QVBoxLayout, QCheckBox, QProgressBar,\
-                            QLabel, QFileDialog, QApplication, QWidget, QTabWidget
+                            QLabel, QFileDialog, QApplication, QWidget
 
 # Local import
 import Local_DB_Viwer.table_viewer as table_viewer
+import Local_DB_Viwer.file_loader as file_loader
+import Local_DB_Viwer.csv_cache as csv_cache
+import Local_DB_Viwer.type_optimizer as type_optimizer
 
 class FileDialog(QWidget):
     """
@@ -15,6 +16,12 @@ class FileDialog(QWidget):
     def __init__(self, parent = None):
         super().__init__(parent)
         self._bool = False
+        self._lazy = False
+        self._typed = True
+        self.memory_saved = [0, 0]
+        self.cache = csv_cache.CsvCache()
+        self.loader = None
+        self.errors = []
         self.init_ui()
     
     def init_ui(self) -> None:
@@ -29,16 +36,35 @@ class FileDialog(QWidget):
         check_button = QCheckBox("Run all csvs in directory")
         check_button.toggled.connect(self.run_all_csv)
 
+        lazy_button = QCheckBox("Lazy load all files")
+        lazy_button.toggled.connect(self.lazy_load)
+
+        cache_button = QCheckBox("Cache parsed csvs")
+        cache_button.setChecked(True)
+        cache_button.toggled.connect(self.use_cache)
+
+        typed_button = QCheckBox("Store columns in compact types")
+        typed_button.setChecked(True)
+        typed_button.toggled.connect(self.type_columns)
+
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setGeometry(30, 40, 200, 25)
         self.progress_bar.setVisible(False)
         self.progress_bar.setValue(0)
 
+        self.cancel_button = QPushButton('Cancel Loading', self)
+        self.cancel_button.clicked.connect(self.cancel_loader)
+        self.cancel_button.setVisible(False)
+
         self.label = QLabel()
 
         layout.addWidget(btn_open_dialog)
         layout.addWidget(check_button)
+        layout.addWidget(lazy_button)
+        layout.addWidget(cache_button)
+        layout.addWidget(typed_button)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
         layout.addWidget(self.label)
 
         self.setLayout(layout)
@@ -51,90 +77,96 @@ class FileDialog(QWidget):
         Show the file dialog window that allows the user to select what csvs they want to load
         """
         self.dict = {}
-        self.single_file() if not self._bool else self.multi_file()
+        file_paths = self.single_file() if not self._bool else self.multi_file()
+        if not file_paths:
+            return
 
+        # Open the viewer right away, tables are added as the loader finishes them
         self.table_model = table_viewer.DataFrameViewer(self.dict)
         self.table_model.show()
+        self.start_loader(file_paths)
         return
 
-    def single_file(self) -> None:
+    def single_file(self) -> list:
         """
         Process individual files that the user selects
         """
         file_dialog = QFileDialog()
-        self.tab_widget = QTabWidget()
         file_dialog.setFileMode(QFileDialog.ExistingFiles)
         file_dialog.setNameFilter("CSV files (*.csv); SQLite database files (*.db)")
 
         selected_files, _ = file_dialog.getOpenFileNames(self, 'Select Datafiles', '')
-        total_files = len(selected_files)
-
-        # Check if user selected a csv, then convert to dataframe
-        if selected_files:
-            for idx, file_path in enumerate (selected_files):
-                file_name = os.path.basename(file_path)
-                if file_name.endswith('.csv'):
-                    csv_name = file_name.rstrip('.csv')
-                    self.process_csvs(file_path, csv_name)
-                elif file_name.endswith('.db'):
-                    self.process_db(file_path)
-                self.progress_status(idx, total_files)
-        return
+        return [file_path for file_path in selected_files if file_path.endswith(('.csv', '.db'))]
 
-    def multi_file(self) -> None:
+    def multi_file(self) -> list:
         """
         Process multiple CSV files at once
         """
         directory = QFileDialog.getExistingDirectory(None, "Select a directory", ".", QFileDialog.ShowDirsOnly)
 
         if directory:
-            csv_files = [file for file in os.listdir(directory) if file.endswith(".csv")]
-            total_files = len(csv_files)
-
-            for idx, csv_name in  enumerate (csv_files):
-                if csv_name.endswith(".csv"):
-                    file_path = os.path.join(directory, csv_name)
-                    self.process_csvs(file_path, csv_name)
-                    self.progress_status(idx, total_files)
-        return
+            return [os.path.join(directory, file) for file in os.listdir(directory) if file.endswith(".csv")]
+        return []
 
-    def process_csvs(self, file_path, csv_name) -> None:
+    def start_loader(self, file_paths) -> None:
         """
-        Processes the CSVS into dataframes
+        Parse the files in the background so the GUI stays responsive
         """
+        self.cancel_loader()
+        self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
+        self.cancel_button.setVisible(True)
+        self.label.setText(f"Processing {len(file_paths)} files...")
+        self.memory_saved = [0, 0]
+
+        self.loader = file_loader.FileLoader(file_paths, self._lazy, self.cache, self._typed)
+        self.loader.table_typed.connect(self.table_typed)
+        self.loader.table_loaded.connect(self.create_table)
+        self.loader.file_finished.connect(self.progress_status)
+        self.loader.file_failed.connect(self.file_failed)
+        self.loader.finished.connect(self.loader_finished)
+        self.loader.start()
+        return
 
-        try:
-            data = pl.scan_csv(file_path).collect()
-            df = self.add_index(data)
-            self.label.setText(f"Processing {file_path}")
-        except UnicodeDecodeError:
-            df = pl.DataFrame()
-            self.label.setText(f"Error decoding file {file_path}.")
-        except Exception as e:
-            df = pl.DataFrame()
-            self.label.setText(f"An error occurred while processing {file_path}: {e}")
-        self.create_table(df, csv_name)
+    def cancel_loader(self) -> None:
+        """
+        Cancel the files that are still waiting to be loaded
+        """
+        if self.loader is not None and self.loader.isRunning():
+            self.loader.cancel()
+            self.label.setText("Cancelling remaining files...")
         return
 
-    def process_db(self, file_path):
+    def loader_finished(self) -> None:
         """
-        Process SQL Lite database files
+        Loader has processed every file or was cancelled
         """
-        engine = create_engine(f"sqlite:///{file_path}")
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
+        self.cancel_button.setVisible(False)
+        if self.loader.is_cancelled():
+            self.label.setText(f"Loading cancelled, {len(self.dict)} tables loaded.")
+        elif not self.errors:
+            self.label.setText(f"Finished loading {len(self.dict)} tables.")
+            if self.memory_saved[0]:
+                self.label.setText(f"Finished loading {len(self.dict)} tables. "
+                                   f"{type_optimizer.report('Compact types', *self.memory_saved)}")
+        self.errors = []
+        return
 
-        # Extract table names
-        table_names = metadata.tables.keys()
-        for table_name in table_names:
-            data = pl.read_database(
-                query=f"SELECT * FROM {table_name}",
-                connection=engine
-            )
+    def file_failed(self, file_path, message) -> None:
+        """
+        Let the user know a file could not be processed
+        """
+        self.errors.append(file_path)
+        self.label.setText(message)
+        return
 
-            df = self.add_index(data)
-            self.create_table(df, table_name)
+    def table_typed(self, csv_name, before, after) -> None:
+        """
+        Let the user know how much memory the compact column types saved
+        """
+        self.memory_saved[0] += before
+        self.memory_saved[1] += after
+        self.label.setText(type_optimizer.report(csv_name, before, after))
         return
 
     def create_table(self, df, csv_name) -> None:
@@ -142,6 +174,7 @@ class FileDialog(QWidget):
         Load the dataframes into seperate table that creates tabs for each item
         """
         self.dict[csv_name] = df
+        self.table_model.add_table(csv_name, df)
         return
 
     def run_all_csv(self, checked):
@@ -151,22 +184,34 @@ class FileDialog(QWidget):
         self._bool = checked
         return
 
-    def progress_status(self, idx, total_files):
+    def lazy_load(self, checked):
         """
-        Set the status of the progress bar
+        Scan every file lazily instead of only the ones over the size threshold
         """
-        progress_value = int((idx + 1) / total_files * 100)
-        self.progress_bar.setValue(progress_value)
+        self._lazy = checked
+        return
+
+    def use_cache(self, checked):
+        """
+        Reuse the columnar copies of csvs that were parsed before
+        """
+        self.cache = csv_cache.CsvCache() if checked else None
         return
 
-    def add_index(self, data) -> pl.DataFrame:
+    def type_columns(self, checked):
         """
-        Add index column if it does not exist
+        Store repeated text as categories, dates as dates and numbers in the smallest type that fits
         """
-        if 'Index' not in data.columns:
-            df = pl.DataFrame({'Index': range(data.height)}).hstack(data)
-            return df
-        return data
+        self._typed = checked
+        return
+
+    def progress_status(self, done, total_files):
+        """
+        Set the status of the progress bar
+        """
+        progress_value = int(done / total_files * 100)
+        self.progress_bar.setValue(progress_value)
+        return
     
 # THIS IS FOR TESTING
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+import numpy as np
+import polars as pl
+
+class TrigramIndex:
+    """
+    Inverted index of the three letter pieces of a text column. Every distinct value gets a code,
+    each trigram lists the codes of the values holding it and each code lists the rows holding it,
+    so a substring lookup only checks the few values sharing all of its trigrams
+    """
+
+    gram = 3
+
+    def __init__(self, values, row_codes, grams, bounds, codes) -> None:
+        self.values = values
+        self.grams = grams
+        self.bounds = bounds
+        self.codes = codes
+        self.row_codes = row_codes
+
+        # Rows grouped by their value code
+        self.order = np.argsort(row_codes, kind='stable')
+        self.starts = np.searchsorted(row_codes[self.order], np.arange(len(values) + 1))
+
+    @classmethod
+    def build(cls, series) -> 'TrigramIndex':
+        """
+        Index a column with vectorized passes, text is lowercased since searches ignore case.
+        Trigrams are kept as hashes, a collision only adds candidates that the final check drops
+        """
+        lowered = series.cast(pl.String).str.to_lowercase()
+        values = lowered.drop_nulls().unique().sort()
+        row_codes = values.search_sorted(lowered.fill_null('')).cast(pl.Int64).to_numpy().copy()
+        row_codes[lowered.is_null().to_numpy()] = -1
+
+        # Longest values first, so the values long enough for each offset are always a prefix
+        lengths = values.str.len_chars().cast(pl.Int64).to_numpy()
+        by_length = np.argsort(-lengths, kind='stable')
+        longest = values.gather(by_length)
+        counts = np.searchsorted(-lengths[by_length], -np.arange(cls.gram, lengths.max(initial=0) + 1), side='right')
+
+        # Each (trigram, code) pair is packed into one integer: a 32 bit trigram hash over the value code
+        pairs = np.empty(int(counts.sum()), dtype=np.uint64)
+        position = 0
+        for offset, count in enumerate(counts):
+            hashes = longest.slice(0, count).str.slice(offset, cls.gram).hash().to_numpy() >> np.uint64(32)
+            pairs[position:position + count] = (hashes << np.uint64(32)) | by_length[:count].astype(np.uint64)
+            position += count
+
+        pairs.sort()
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])] if len(pairs) else pairs
+        keys = pairs >> np.uint64(32)
+        grams, starts = np.unique(keys, return_index=True)
+        bounds = np.append(starts, len(keys))
+        return cls(values, row_codes, grams, bounds, (pairs & np.uint64(0xFFFFFFFF)).astype(np.int64))
+
+    def posting(self, gram) -> np.ndarray:
+        """
+        Codes of the values holding a trigram
+        """
+        key = pl.Series([gram]).hash().item() >> 32
+        position = np.searchsorted(self.grams, key)
+        if position >= len(self.grams) or self.grams[position] != key:
+            return np.empty(0, dtype=np.int64)
+        return self.codes[self.bounds[position]:self.bounds[position + 1]]
+
+    def useful(self, text, regex=False) -> bool:
+        """
+        Trigrams answer literal lookups, other lookups only gain when values repeat a lot
+        """
+        if not regex and len(text) >= self.gram:
+            return True
+        return len(self.values) * 4 <= len(self.row_codes)
+
+    def matching_codes(self, text, regex=False) -> np.ndarray:
+        """
+        Codes of the values that hold the text. Regex patterns are checked against the distinct values only
+        """
+        if regex:
+            return np.flatnonzero(self.values.str.contains(f"(?i){text}").fill_null(False).to_numpy())
+
+        text = text.lower()
+        if len(text) < self.gram:
+            return np.flatnonzero(self.values.str.contains(text, literal=True).to_numpy())
+
+        # Start from the rarest trigram so the intersections stay small
+        grams = {text[i:i + self.gram] for i in range(len(text) - self.gram + 1)}
+        candidates = None
+        for posting in sorted((self.posting(gram) for gram in grams), key=len):
+            # Checking a few candidates is cheaper than intersecting a much longer list
+            if candidates is not None and len(posting) > 8 * len(candidates):
+                break
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                return candidates
+
+        # Sharing every trigram does not mean the text is there in one piece
+        found = self.values.gather(candidates).str.contains(text, literal=True).to_numpy()
+        return candidates[found]
+
+    def search(self, text, regex=False) -> np.ndarray:
+        """
+        Row positions holding the text, in table order
+        """
+        codes = self.matching_codes(text, regex)
+        if len(codes) > 1024:
+            # Null rows have code -1 and land on the extra flag that is never set
+            found = np.zeros(len(self.values) + 1, dtype=bool)
+            found[codes] = True
+            return np.flatnonzero(found[self.row_codes])
+        if not len(codes):
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate([self.order[self.starts[code]:self.starts[code + 1]] for code in codes])
+        return np.sort(rows)
@@ -0,0 +1,481 @@
+import re
+import datetime
+import functools
+import polars as pl
+
+# Tokens of the viewer search syntax: quoted strings and columns, operators, parentheses, and/or symbols and words
+TOKEN = re.compile(r"""\s*(?:(?P<string>'[^']*'|"[^"]*")|(?P<ident>`[^`]+`)|(?P<op>>=|<=|!=|==|=|>|<)"""
+                   r"""|(?P<paren>[()])|(?P<comma>,)|(?P<symbol>[&|])|(?P<word>[^\s=<>!(),&|'"`]+))""")
+
+KEYWORDS = {'and': 'and', '&': 'and', 'or': 'or', '|': 'or', 'not': 'not',
+            'in': 'in', 'between': 'between', 'like': 'like'}
+
+# Flipping a comparison is cheaper than negating it
+NEGATED = {'=': '!=', '!=': '=', '>': '<=', '<': '>=', '>=': '<', '<=': '>'}
+
+class QueryError(ValueError):
+    """
+    Search text that can not be understood
+    """
+
+class Condition:
+    """
+    Single comparison of a column. `in` holds a list of values and `between` a (low, high) pair,
+    `raw` keeps the values as they were typed for comparing against text columns
+    """
+
+    def __init__(self, column, op, value, negate=False, raw=None) -> None:
+        self.column = column
+        self.op = '=' if op == '==' else op
+        self.value = value
+        self.negate = negate
+        self.raw = value if raw is None else raw
+
+    def conditions(self) -> list:
+        return [self]
+
+    def inverted(self) -> 'Condition':
+        """
+        Same condition with the result flipped
+        """
+        if self.op in NEGATED and not self.negate:
+            return Condition(self.column, NEGATED[self.op], self.value, raw=self.raw)
+        return Condition(self.column, self.op, self.value, not self.negate, self.raw)
+
+    def __repr__(self) -> str:
+        return f"Condition({self.column!r} {'not ' if self.negate else ''}{self.op} {self.value!r})"
+
+class BoolOp:
+    """
+    Conditions joined together with and/or
+    """
+
+    def __init__(self, op, items) -> None:
+        self.op = op
+        self.items = items
+
+    def conditions(self) -> list:
+        return [cond for item in self.items for cond in item.conditions()]
+
+    def __repr__(self) -> str:
+        return f"BoolOp({self.op}, {self.items!r})"
+
+class Not:
+    """
+    Negated group of conditions, the conditions inside are highlighted where they do not match
+    """
+
+    def __init__(self, item) -> None:
+        self.item = item
+
+    def conditions(self) -> list:
+        return [cond.inverted() for cond in self.item.conditions()]
+
+    def __repr__(self) -> str:
+        return f"Not({self.item!r})"
+
+def tokenize(text) -> list:
+    """
+    Split the search text into (kind, value) tokens
+    """
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Unexpected character at {position}: {text[position:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in ('symbol', 'word') and value.lower() in KEYWORDS:
+            kind, value = 'keyword', KEYWORDS[value.lower()]
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+def literal(text) -> object:
+    """
+    Type an unquoted value: numbers, dates, datetimes, booleans and null, anything else is text
+    """
+    if re.fullmatch(r'[+-]?\d+', text):
+        return int(text)
+    if re.fullmatch(r'[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?', text):
+        return float(text)
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}', text):
+        return datetime.date.fromisoformat(text)
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?', text):
+        return datetime.datetime.fromisoformat(text)
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    if text.lower() == 'null':
+        return None
+    return text
+
+class Parser:
+    """
+    Recursive descent parser of the search text, `not` binds tighter than `and`, `and` tighter than `or`
+    """
+
+    def __init__(self, text) -> None:
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self) -> tuple:
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self) -> tuple:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, token, message) -> None:
+        if self.take() != token:
+            raise QueryError(message)
+        return
+
+    def parse(self) -> object:
+        if not self.tokens:
+            raise QueryError("Nothing to search for")
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise QueryError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self) -> object:
+        items = [self.parse_and()]
+        while self.peek() == ('keyword', 'or'):
+            self.take()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else BoolOp('or', items)
+
+    def parse_and(self) -> object:
+        items = [self.parse_not()]
+        while self.peek() in (('keyword', 'and'), ('comma', ',')):
+            self.take()
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else BoolOp('and', items)
+
+    def parse_not(self) -> object:
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self) -> object:
+        if self.peek() == ('paren', '('):
+            self.take()
+            node = self.parse_or()
+            self.expect(('paren', ')'), "Missing closing parenthesis")
+            return node
+        return self.parse_condition()
+
+    def parse_condition(self) -> Condition:
+        column = self.column()
+        negate = self.peek() == ('keyword', 'not')
+        if negate:
+            self.take()
+
+        kind, op = self.take()
+        if (kind, op) == ('keyword', 'in'):
+            values = self.value_list()
+            return Condition(column, 'in', [v for v, _ in values], negate, [r for _, r in values])
+        if (kind, op) == ('keyword', 'between'):
+            low = self.value()
+            self.expect(('keyword', 'and'), "Expected `between low and high`")
+            high = self.value()
+            return Condition(column, 'between', (low[0], high[0]), negate, (low[1], high[1]))
+        if (kind, op) == ('keyword', 'like'):
+            return Condition(column, 'like', self.value()[1], negate)
+        if kind != 'op' or negate:
+            raise QueryError(f"Expected an operator after {column!r}, got {op!r}")
+        value, raw = self.value()
+        return Condition(column, op, value, raw=raw)
+
+    def column(self) -> str:
+        """
+        Column names may be several words long or quoted with backticks
+        """
+        if self.peek()[0] == 'ident':
+            return self.take()[1][1:-1]
+        words = self.words()
+        if not words:
+            raise QueryError(f"Expected a column name, got {self.peek()[1]!r}")
+        return ' '.join(words)
+
+    def value(self) -> tuple:
+        """
+        Get a (typed, raw) value. Quoted values are always text, unquoted values are typed
+        """
+        if self.peek()[0] == 'string':
+            raw = self.take()[1][1:-1]
+            return raw, raw
+        words = self.words()
+        if not words:
+            raise QueryError(f"Expected a value, got {self.peek()[1]!r}")
+        raw = ' '.join(words)
+        return literal(raw), raw
+
+    def value_list(self) -> list:
+        self.expect(('paren', '('), "Expected `in (value, ...)`")
+        values = [self.value()]
+        while self.peek() == ('comma', ','):
+            self.take()
+            values.append(self.value())
+        self.expect(('paren', ')'), "Missing closing parenthesis")
+        return values
+
+    def words(self) -> list:
+        words = []
+        while self.peek()[0] == 'word':
+            words.append(self.take()[1])
+        return words
+
+def parse(text) -> object:
+    """
+    Parse the search text into a tree of conditions
+    """
+    return Parser(text).parse()
+
+def free_text(text, columns, regex=False) -> object:
+    """
+    Look for the text in every given column, as a literal piece of text or a regex pattern
+    """
+    if not text.strip():
+        raise QueryError("Nothing to search for")
+    if not columns:
+        raise QueryError("No text columns to search")
+    items = [Condition(column, 'regex' if regex else 'contains', text) for column in columns]
+    return items[0] if len(items) == 1 else BoolOp('or', items)
+
+def sql_value(value) -> object:
+    """
+    Bind values the way SQLite stores them
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def to_sql(node, columns, params=None, resolve=None) -> tuple:
+    """
+    Translate the condition tree into a parameterized SQL WHERE clause.
+    `columns` maps the searched column names to SQL expressions, `resolve` matches typed names to them
+    """
+    params = {} if params is None else params
+    if isinstance(node, BoolOp):
+        parts = [to_sql(item, columns, params, resolve)[0] for item in node.items]
+        return '(' + f' {node.op.upper()} '.join(parts) + ')', params
+    if isinstance(node, Not):
+        return f"NOT ({to_sql(node.item, columns, params, resolve)[0]})", params
+
+    name = resolve(node.column) if resolve is not None else node.column
+    if name not in columns:
+        raise QueryError(f"Unknown column {node.column!r}")
+
+    def bind(value) -> str:
+        key = f"p{len(params)}"
+        params[key] = sql_value(value)
+        return f":{key}"
+
+    # Columns that are not stored as they are searched translate their own conditions
+    if callable(columns[name]):
+        return columns[name](node, bind), params
+
+    values = node.value if node.op in ('in', 'between') else [node.value]
+    collate = ' COLLATE NOCASE' if any(isinstance(value, str) for value in values) else ''
+    column = columns[name] + collate
+    negate = 'NOT ' if node.negate else ''
+
+    match node.op:
+        case 'in':
+            return f"{column} {negate}IN ({', '.join(bind(value) for value in values)})", params
+        case 'between':
+            return f"{column} {negate}BETWEEN {bind(values[0])} AND {bind(values[1])}", params
+        case 'like':
+            # LIKE already ignores case in SQLite
+            return f"{columns[name]} {negate}LIKE {bind(node.value)}", params
+        case 'contains':
+            return f"{negate}instr(lower({columns[name]}), {bind(node.value.lower())}) > 0", params
+        case 'regex':
+            # Matched by the REGEXP function every database connection gets
+            try:
+                re.compile(node.value)
+            except re.error as e:
+                raise QueryError(f"Invalid regex {node.value!r}: {e}")
+            return f"{negate}{columns[name]} REGEXP {bind(node.value)}", params
+    if node.value is None:
+        if node.op not in ('=', '!='):
+            raise QueryError("null can only be compared with = or !=")
+        return f"{negate}{column} IS {'NOT ' if node.op == '!=' else ''}NULL", params
+    return f"{negate}{column} {node.op} {bind(node.value)}", params
+
+def is_text(dtype) -> bool:
+    return dtype == pl.String or dtype == pl.Categorical or isinstance(dtype, pl.Enum)
+
+def is_free_text(dtype) -> bool:
+    """
+    Columns free text searches look in, dates typed from text are searched as their text
+    """
+    return is_text(dtype) or dtype.is_temporal()
+
+def coerce(value, raw, dtype, column) -> object:
+    """
+    Convert a value to the type of the column it is compared to
+    """
+    if value is None:
+        return None
+    try:
+        if is_text(dtype):
+            return str(raw).lower()
+        if dtype == pl.Boolean:
+            return {'true': True, 'false': False, '1': True, '0': False}[str(raw).lower()]
+        if dtype.is_numeric():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                # Float columns only match `in` lists of floats
+                return float(value) if dtype.is_float() else value
+            return float(raw) if dtype.is_float() else int(raw)
+        if dtype == pl.Date:
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(raw)
+        if isinstance(dtype, pl.Datetime):
+            if isinstance(value, datetime.datetime):
+                return value
+            if isinstance(value, datetime.date):
+                return datetime.datetime.combine(value, datetime.time())
+            return datetime.datetime.fromisoformat(raw)
+    except (ValueError, KeyError, TypeError):
+        raise QueryError(f"{raw!r} can not be compared to {column} ({dtype})")
+    return value
+
+def like_pattern(pattern) -> tuple:
+    """
+    Turn a SQL LIKE pattern into the cheapest Polars string check
+    """
+    body = pattern.strip('%')
+    if '%' not in body and '_' not in body:
+        starts, ends = pattern.startswith('%'), pattern.endswith('%')
+        if starts and ends:
+            return 'contains', body
+        if ends:
+            return 'starts_with', body
+        if starts:
+            return 'ends_with', body
+        return 'equals', body
+    regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return 'regex', f"^{regex}$"
+
+class CompiledQuery:
+    """
+    Search text compiled against a table schema: one filter expression for the rows
+    and a hit flag per condition for the highlighted cells
+    """
+
+    def __init__(self, node, schema, lowered) -> None:
+        self.node = node
+        self.schema = schema
+        self.lowered = lowered
+        self.names = {name.lower(): name for name in schema}
+
+        self.conditions = node.conditions()
+        self.expr = self.compile(node)
+        self.flags = [(self.resolve(cond.column), self.compile(cond).fill_null(False))
+                      for cond in self.conditions]
+        self.columns = list(dict.fromkeys(column for column, _ in self.flags))
+
+    def resolve(self, column) -> str:
+        """
+        Match a typed column name without caring about case
+        """
+        if column in self.schema:
+            return column
+        if column.lower() in self.names:
+            return self.names[column.lower()]
+        raise QueryError(f"Unknown column {column!r}")
+
+    def compile(self, node) -> pl.Expr:
+        """
+        Build the Polars expression of a condition tree
+        """
+        if isinstance(node, BoolOp):
+            exprs = [self.compile(item) for item in node.items]
+            return pl.all_horizontal(exprs) if node.op == 'and' else pl.any_horizontal(exprs)
+        if isinstance(node, Not):
+            return ~self.compile(node.item)
+
+        name = self.resolve(node.column)
+        dtype = self.schema[name]
+        column = pl.col(name)
+        if is_text(dtype) and (not self.lowered or isinstance(dtype, pl.Enum)):
+            column = column.cast(pl.String).str.to_lowercase()
+        elif dtype == pl.Categorical and node.op not in ('=', '!=', 'in'):
+            # Lowered categories compare directly, string functions need the text
+            column = column.cast(pl.String)
+
+        match node.op:
+            case 'in':
+                expr = column.is_in([coerce(v, r, dtype, name) for v, r in zip(node.value, node.raw)])
+            case 'between':
+                low, high = (pl.lit(coerce(v, r, dtype, name)) for v, r in zip(node.value, node.raw))
+                expr = column.is_between(low, high)
+            case 'like':
+                expr = self.like(column if is_text(dtype) else column.cast(pl.String), node.value.lower())
+            case 'contains':
+                expr = (column if is_text(dtype) else column.cast(pl.String)).str.contains(node.value.lower(),
+                                                                                          literal=True)
+            case 'regex':
+                expr = pl.col(name).cast(pl.String).str.contains(f"(?i){node.value}")
+            case _:
+                expr = self.compare(column, node.op, coerce(node.value, node.raw, dtype, name))
+        return ~expr if node.negate else expr
+
+    def like(self, column, pattern) -> pl.Expr:
+        kind, pattern = like_pattern(pattern)
+        if kind == 'equals':
+            return column == pattern
+        if kind == 'regex':
+            return column.str.contains(pattern)
+        if kind == 'contains':
+            return column.str.contains(pattern, literal=True)
+        return getattr(column.str, kind)(pattern)
+
+    def compare(self, column, op, value) -> pl.Expr:
+        if value is None:
+            if op not in ('=', '!='):
+                raise QueryError("null can only be compared with = or !=")
+            return column.is_null() if op == '=' else column.is_not_null()
+
+        match op:
+            case '=':
+                return column == value
+            case '!=':
+                return column != value
+            case '>':
+                return column > value
+            case '<':
+                return column < value
+            case '>=':
+                return column >= value
+            case '<=':
+                return column <= value
+        raise QueryError(f"Invalid operator: {op}")
+
+@functools.lru_cache(maxsize=256)
+def _compile(text, schema, lowered, mode, columns) -> CompiledQuery:
+    schema = dict(schema)
+    if mode == 'query':
+        node = parse(text)
+    else:
+        node = free_text(text, [column for column in columns if is_free_text(schema[column])], mode == 'regex')
+    return CompiledQuery(node, schema, lowered)
+
+def compile_query(text, schema, lowered=True, mode='query', columns=()) -> CompiledQuery:
+    """
+    Compile the search text against a table schema. Plans are cached by query text and schema,
+    `lowered` tells if the text columns of the searched frame are already lowercased.
+    The 'text' and 'regex' modes look for the text in the given columns instead of parsing it
+    """
+    text = text.strip() if mode == 'query' else text
+    return _compile(text, tuple(schema.items()), lowered, mode, tuple(columns))
@@ -0,0 +1,480 @@
+import os
+import functools
+import itertools
+import threading
+import numpy as np
+import polars as pl
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Local import
+import Local_DB_Viwer.query_parser as query_parser
+import Local_DB_Viwer.highlight as highlight
+import Local_DB_Viwer.column_index as column_index
+
+class SearchResult:
+    """
+    Row positions a search matched over the whole table, and the positions each column matched on
+    """
+
+    def __init__(self, rows, hits) -> None:
+        self.rows = rows
+        self.hits = hits
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def empty(cls) -> 'SearchResult':
+        return cls(np.empty(0, dtype=np.int64), {})
+
+class SearchCancelled(Exception):
+    """
+    A newer search took over while this one was running
+    """
+
+class SearchRequest:
+    """
+    What was searched for on a table. Live requests come from typing and drop invalid text quietly,
+    progressive requests hand back hits block by block and stop once `limit` matches are found
+    """
+
+    def __init__(self, text, mode='query', columns=None, generation=0, live=False,
+                 progressive=False, limit=0) -> None:
+        self.text = text
+        self.mode = mode
+        self.columns = tuple(columns) if columns is not None else None
+        self.generation = generation
+        self.live = live
+        self.progressive = progressive
+        self.limit = limit
+
+def to_rows(series) -> np.ndarray:
+    """
+    Row positions as an int64 array
+    """
+    return series.cast(pl.Int64).to_numpy()
+
+def check(token) -> None:
+    """
+    Stop a search that was cancelled
+    """
+    if token is not None and token.cancelled():
+        raise SearchCancelled()
+    return
+
+def evaluate(source, text, mode='query', columns=None, token=None) -> SearchResult:
+    """
+    Compile the search for the table and run it over every row in one filter.
+    The 'text' and 'regex' modes look for the text in every given text column
+    """
+    if mode != 'query':
+        return evaluate_text(source, text, source.columns if columns is None else columns, mode == 'regex', token)
+
+    # SQLite tables answer the search themselves
+    if source.pushdown:
+        return pushdown(source, query_parser.compile_query(text, source.schema), token)
+
+    frame, lowered = source.search_frame()
+    query = query_parser.compile_query(text, source.schema, lowered)
+
+    # Column indexes can cut the search down to a few rows, a plan that fails falls back to the scan
+    try:
+        rows = plan(source, query)
+    except (OverflowError, TypeError, ValueError, pl.exceptions.PolarsError) as e:
+        print(f"Unable to plan search with the column indexes: {e}")
+        rows = None
+    if rows is not None and len(rows) <= source.height * refine_fraction:
+        return evaluate_within(source, SearchRequest(text, mode, columns), rows, token)
+    return scan(frame, query, token)
+
+def plan(source, query, node=None) -> np.ndarray:
+    """
+    Rows the search can match going by the column indexes, `and` intersects the rows of its
+    conditions and `or` joins them. None when the indexes can not narrow the search down
+    """
+    node = query.node if node is None else node
+    if isinstance(node, query_parser.BoolOp):
+        found = [plan(source, query, item) for item in node.items]
+        if node.op == 'and':
+            found = [rows for rows in found if rows is not None]
+            return column_index.intersect(found, source.height) if found else None
+        if any(rows is None for rows in found):
+            return None
+        return column_index.union(found, source.height)
+    if isinstance(node, query_parser.Not) or node.negate or node.op in ('!=', 'like', 'contains', 'regex'):
+        return None
+
+    column = query.resolve(node.column)
+    dtype = query.schema[column]
+    if node.op in ('in', 'between'):
+        value = [query_parser.coerce(v, r, dtype, column) for v, r in zip(node.value, node.raw)]
+        if any(item is None for item in value):
+            return None
+    else:
+        value = query_parser.coerce(node.value, node.raw, dtype, column)
+        if value is None:
+            return None
+
+    index = source.column_index(column)
+    return index.candidates(node.op, value) if index is not None else None
+
+def pushdown(source, query, token=None) -> SearchResult:
+    """
+    Let the source run the compiled search, SQLite stops the query once the token is cancelled
+    """
+    try:
+        positions, hits = source.search(query, token)
+    except query_parser.QueryError:
+        check(token)
+        raise
+    return SearchResult(to_rows(positions), {column: to_rows(rows) for column, rows in hits.items()})
+
+# Rows of the searched columns read from the frame between two cancel checks
+scan_rows = 500_000
+
+def batches(frame, columns, token=None, rows=scan_rows):
+    """
+    Searched columns of the frame a batch at a time, with the row each batch starts at.
+    The frame is read in one pass and the search stops between batches once it is cancelled
+    """
+    offset = 0
+    for df in frame.select(columns).collect_batches(chunk_size=rows, maintain_order=True):
+        check(token)
+        yield offset, df
+        offset += df.height
+    return
+
+def matches(df, query, offset=0) -> pl.DataFrame:
+    """
+    Rows of a batch the compiled search matches, with the flag of every condition
+    """
+    flags = [flag.alias(f"__hit{idx}") for idx, (_, flag) in enumerate(query.flags)]
+    return (df
+            .with_row_index('__row', offset=offset)
+            .filter(query.expr)
+            .select([pl.col('__row').cast(pl.Int64)] + flags))
+
+def scan(frame, query, token=None) -> SearchResult:
+    """
+    Filter the frame with the compiled search, only the searched columns are read.
+    With a token the frame is filtered a batch at a time so a cancelled search stops early
+    """
+    if token is None:
+        df = matches(frame.select(query.columns), query).collect()
+    else:
+        found = [matches(batch, query, offset) for offset, batch in batches(frame, query.columns, token)]
+        df = pl.concat(found) if found else matches(frame.select(query.columns).head(0).collect(), query)
+    return to_result(df, query)
+
+def to_result(df, query) -> SearchResult:
+    """
+    Matched rows and the rows every searched column matched on, from the flags of the filtered rows
+    """
+    hits = {}
+    for idx, (column, _) in enumerate(query.flags):
+        rows = to_rows(df.filter(pl.col(f"__hit{idx}"))['__row'])
+        hits[column] = rows if column not in hits else np.union1d(hits[column], rows)
+    return SearchResult(to_rows(df['__row']), hits)
+
+def evaluate_text(source, text, columns, regex=False, token=None) -> SearchResult:
+    """
+    Look for the text in the text and date columns. Columns with a trigram index answer from it,
+    the others are scanned in one filter
+    """
+    columns = [column for column in columns if query_parser.is_free_text(source.schema[column])]
+    indexes = {column: index for column, index in source.text_indexes(columns).items() if index.useful(text, regex)}
+    hits = {}
+    for column, index in indexes.items():
+        check(token)
+        hits[column] = index.search(text, regex)
+
+    rest = [column for column in columns if column not in indexes]
+    if rest or not columns:
+        mode = 'regex' if regex else 'text'
+        query = query_parser.compile_query(text, source.schema, True, mode, rest)
+        if source.pushdown:
+            result = pushdown(source, query, token)
+        else:
+            frame, lowered = source.search_frame()
+            result = scan(frame, query_parser.compile_query(text, source.schema, lowered, mode, rest), token)
+        hits.update(result.hits)
+
+    source.note_text_search(columns)
+    rows = functools.reduce(np.union1d, hits.values(), np.empty(0, dtype=np.int64))
+    return SearchResult(rows, hits)
+
+# Refine on the previous rows only while they are a small part of the table
+refine_fraction = 0.25
+
+def narrows(previous, request) -> bool:
+    """
+    Check if a search can only match rows the previous search matched: a longer piece of
+    free text, or the previous query with more `and` conditions added
+    """
+    if previous is None or previous.mode != request.mode or previous.columns != request.columns:
+        return False
+    # Searches stopped early did not see every row
+    if previous.limit:
+        return False
+    if request.mode == 'text':
+        return bool(previous.text.strip()) and previous.text.lower() in request.text.lower()
+    if request.mode != 'query':
+        return False
+
+    try:
+        old, new = query_parser.parse(previous.text), query_parser.parse(request.text)
+    except query_parser.QueryError:
+        return False
+    if not isinstance(new, query_parser.BoolOp) or new.op != 'and':
+        return False
+
+    size = len(old.items) if isinstance(old, query_parser.BoolOp) and old.op == 'and' else 1
+    kept = new.items[0] if size == 1 else query_parser.BoolOp('and', new.items[:size])
+    return size < len(new.items) and repr(kept) == repr(old)
+
+def evaluate_within(source, request, rows, token=None) -> SearchResult:
+    """
+    Run the search on some rows of the table only, the rows are gathered and searched as a small frame
+    """
+    columns = request.columns if request.columns is not None else source.columns
+    query = query_parser.compile_query(request.text, source.schema, False, request.mode, columns)
+    result = scan(source.gather(rows, query.columns).lazy(), query, token)
+    return SearchResult(rows[result.rows], {column: rows[hits] for column, hits in result.hits.items()})
+
+def refine(source, request, previous=None, token=None) -> SearchResult:
+    """
+    Search the table, narrowing searches only look through the rows the previous search found.
+    SQLite tables run every search themselves, gathering the previous rows would read them one page at a time
+    """
+    if not source.pushdown and previous is not None and narrows(previous[0], request) \
+            and previous[1].count <= source.height * refine_fraction:
+        return evaluate_within(source, request, previous[1].rows, token)
+    return evaluate(source, request.text, request.mode, request.columns, token)
+
+# Progressive searches start with small blocks so the first hits show quickly, then grow them
+first_block = 50_000
+max_block = 2_000_000
+
+def first_matches(result, count) -> SearchResult:
+    """
+    Keep the first matched rows only
+    """
+    rows = result.rows[:count]
+    last = rows[-1] if len(rows) else -1
+    return SearchResult(rows, {column: hits[hits <= last] for column, hits in result.hits.items()})
+
+def progressive(source, request, token=None):
+    """
+    Search the table block by block, yielding (block result, rows searched) as each block is done.
+    The table is read in one pass and its batches are put together into the growing blocks.
+    Stops once the request limit is reached or a newer search cancels it
+    """
+    if source.pushdown:
+        result = evaluate(source, request.text, request.mode, request.columns, token)
+        yield (first_matches(result, request.limit) if request.limit else result), source.height
+        return
+
+    columns = request.columns if request.columns is not None else source.columns
+    frame, lowered = source.search_frame()
+    query = query_parser.compile_query(request.text, source.schema, lowered, request.mode, columns)
+
+    offset, block, found, pending = 0, first_block, 0, []
+    stream = batches(frame, query.columns, token, first_block)
+    for start, df in itertools.chain(stream, [(None, None)]):
+        if df is not None:
+            pending.append(df)
+            if start + df.height - offset < block:
+                continue
+        if not pending:
+            break
+
+        df = pl.concat(pending)
+        result = to_result(matches(df, query, offset), query)
+        offset, block, pending = offset + df.height, min(block * 2, max_block), []
+
+        if request.limit and found + result.count >= request.limit:
+            yield first_matches(result, request.limit - found), offset
+            return
+        found += result.count
+        yield result, offset
+    return
+
+def run_request(source, request, previous=None, token=None) -> tuple:
+    """
+    Search the table and pack the matched rows into a highlight mask.
+    Returns None when the search was cancelled, half typed live queries give no result or mask
+    """
+    try:
+        if request.text.strip():
+            result = refine(source, request, previous, token)
+        else:
+            result = SearchResult.empty()
+    except SearchCancelled:
+        return None
+    except (query_parser.QueryError, pl.exceptions.PolarsError) as e:
+        # Half typed queries are expected while typing
+        if request.live:
+            return None, None
+        print(f"Invalid search: {e}")
+        result = SearchResult.empty()
+
+    if token is not None and token.cancelled():
+        return None
+    return result, highlight.HighlightMask.from_rows(source.height, result.hits)
+
+class CancelToken:
+    """
+    Flag a running search checks to find out a newer search took over
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+        return
+
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+class SearchExecutor(QObject):
+    """
+    Bounded pool of search workers shared by every table of the viewer. Each table (key) only ever
+    gets the result of its newest search, older searches are cancelled and their results dropped
+    """
+    search_finished = pyqtSignal(object, object, object, object)
+    search_progress = pyqtSignal(object, object, object, int)
+
+    max_workers = min(4, os.cpu_count() or 1)
+    _shared = None
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search')
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._tokens = {}
+        self._callbacks = {}
+        self._progress = {}
+
+        # Results are emitted from the workers and delivered on the GUI thread
+        self.search_finished.connect(self.deliver)
+        self.search_progress.connect(self.deliver_progress)
+
+    @classmethod
+    def shared(cls) -> 'SearchExecutor':
+        """
+        Executor used by every table of the viewer
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def submit(self, key, source, request, callback, previous=None, progress=None) -> None:
+        """
+        Queue a search for a table, any search of the table still queued or running is cancelled.
+        Progressive searches call `progress` with the hits of each block before `callback` gets the whole result
+        """
+        token = CancelToken()
+        with self._lock:
+            if key in self._tokens:
+                self._tokens[key].cancel()
+            self._tokens[key] = token
+            self._generations[key] = request.generation
+            self._callbacks[key] = callback
+            self._progress[key] = progress
+
+        future = self.pool.submit(self.run, key, source, request, previous, token)
+        future.add_done_callback(self.report)
+        return
+
+    def run(self, key, source, request, previous, token) -> None:
+        """
+        Worker side of a search, superseded searches stop before, during and after the scan
+        """
+        if token.cancelled():
+            return
+
+        try:
+            found = self.run_progressive(key, source, request, token) if request.progressive else \
+                run_request(source, request, previous, token)
+        except Exception as e:
+            # The table still waits for this search, an empty result clears its pending state
+            print(f"Search failed: {e!r}")
+            found = None if token.cancelled() else \
+                (SearchResult.empty(), highlight.HighlightMask(source.height))
+        if found is not None:
+            self.search_finished.emit(key, request, *found)
+        return
+
+    def run_progressive(self, key, source, request, token) -> tuple:
+        """
+        Emit the hits of every block as it is searched, then the whole result and mask
+        """
+        rows, hits = [], {}
+        try:
+            for result, searched in progressive(source, request, token):
+                rows.append(result.rows)
+                for column, found in result.hits.items():
+                    hits.setdefault(column, []).append(found)
+                self.search_progress.emit(key, request, result, searched)
+        except SearchCancelled:
+            return None
+        except (query_parser.QueryError, pl.exceptions.PolarsError) as e:
+            if request.live:
+                return None, None
+            print(f"Invalid search: {e}")
+
+        if token.cancelled():
+            return None
+        result = SearchResult(np.concatenate(rows) if rows else np.empty(0, dtype=np.int64),
+                              {column: np.concatenate(found) for column, found in hits.items()})
+        return result, highlight.HighlightMask.from_rows(source.height, result.hits)
+
+    def report(self, future) -> None:
+        """
+        Print searches that failed in a worker, the pool would keep the error to itself
+        """
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Search failed: {future.exception()!r}")
+        return
+
+    def deliver(self, key, request, result, mask) -> None:
+        """
+        Hand a result to its table when it is still the newest search of the table
+        """
+        with self._lock:
+            if self._generations.get(key) != request.generation:
+                return
+            callback = self._callbacks.pop(key)
+            self._progress.pop(key, None)
+            del self._tokens[key]
+        callback(request, result, mask)
+        return
+
+    def deliver_progress(self, key, request, result, searched) -> None:
+        """
+        Hand the hits of a block to its table while the search is still the newest of the table
+        """
+        with self._lock:
+            if self._generations.get(key) != request.generation:
+                return
+            progress = self._progress.get(key)
+        if progress is not None:
+            progress(request, result, searched)
+        return
+
+    def cancel(self, key) -> None:
+        """
+        Cancel and forget the searches of a table
+        """
+        with self._lock:
+            token = self._tokens.pop(key, None)
+            self._generations.pop(key, None)
+            self._callbacks.pop(key, None)
+            self._progress.pop(key, None)
+        if token is not None:
+            token.cancel()
+        return
@@ -0,0 +1,189 @@
+import threading
+import numpy as np
+import polars as pl
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Local import
+import Local_DB_Viwer.highlight as highlight
+
+# Row numbers added when loading change whenever rows move, so they are never compared
+ignored_columns = ('index',)
+
+# Changed rows are compared in chunks to find the changed cells
+chunk_rows = 1_000_000
+
+class DiffCancelled(Exception):
+    """
+    The comparison was cancelled before it finished
+    """
+
+class TableDiff:
+    """
+    Rows of two tables matched on a key column: rows only in the left table, rows only in
+    the right table and the matched rows whose values changed, with the changed cells of
+    each column on both sides
+    """
+
+    def __init__(self, key, removed, added, changed, cells, duplicates) -> None:
+        self.key = key
+        self.removed = removed
+        self.added = added
+        self.changed = changed
+        self.cells = cells
+        self.duplicates = duplicates
+
+    def rows(self, side) -> np.ndarray:
+        """
+        Rows of a side (0 left, 1 right) that differ, in table order
+        """
+        only = self.removed if side == 0 else self.added
+        return np.union1d(only, self.changed[side])
+
+    def mask(self, side, height, columns) -> highlight.HighlightMask:
+        """
+        Highlights of a side: whole rows that are only on that side and the changed cells
+        """
+        only = self.removed if side == 0 else self.added
+        mask = highlight.HighlightMask(height)
+        for column in columns:
+            changed = self.cells.get(column)
+            mask.set_rows(column, only if changed is None else np.union1d(only, changed[side]))
+        return mask
+
+    def summary(self) -> str:
+        """
+        Counts of the differences
+        """
+        text = f"{len(self.removed):,} removed, {len(self.added):,} added, {len(self.changed[0]):,} changed rows"
+        if self.duplicates:
+            text += f" ({self.duplicates:,} repeated {self.key} values compared on their first row)"
+        return text
+
+def comparable(column, left, right) -> pl.Expr:
+    """
+    Expression that reads a column the same way in both tables. Columns of different types and
+    categoricals, whose codes differ between tables, are compared as text
+    """
+    if left.schema[column] != right.schema[column] or left.schema[column] == pl.Categorical:
+        return pl.col(column).cast(pl.String)
+    return pl.col(column)
+
+def check(cancelled) -> None:
+    """
+    Stop a comparison that was cancelled
+    """
+    if cancelled is not None and cancelled():
+        raise DiffCancelled()
+    return
+
+def row_hashes(source, columns, exprs, cancelled=None) -> pl.DataFrame:
+    """
+    Hash of the key and of all compared values of every row, nothing else of the table is kept.
+    The row hash holds the key too, so two keys sharing a hash come out as a changed key cell.
+    The table is hashed from its scan a chunk at a time, so only the hashes stay in memory
+    """
+    frame = (source.lazy()
+             .select(columns)
+             .with_row_index('__row')
+             .select(pl.col('__row').cast(pl.Int64), exprs[columns[0]].hash().alias('__key'),
+                     pl.struct([exprs[column] for column in columns]).hash().alias('__hash')))
+    found = []
+    for df in frame.collect_batches(chunk_size=chunk_rows, maintain_order=True):
+        check(cancelled)
+        found.append(df)
+    return pl.concat(found) if found else frame.head(0).collect()
+
+def diff(left, right, key, cancelled=None) -> TableDiff:
+    """
+    Hash join the two tables on the hashed key and compare the row hashes of the matched rows,
+    only the rows whose hashes differ are read back to find the changed cells.
+    `cancelled` is checked between the steps and stops the comparison once it returns True
+    """
+    columns = [key] + [column for column in left.columns
+                       if column in right.schema and column != key and column not in ignored_columns]
+    exprs = {column: comparable(column, left, right) for column in columns}
+    left_rows = row_hashes(left, columns, exprs, cancelled)
+    right_rows = row_hashes(right, columns, exprs, cancelled)
+
+    # Repeated keys are matched on their first row
+    left_first = left_rows.filter(pl.col('__key').is_first_distinct())
+    right_first = right_rows.filter(pl.col('__key').is_first_distinct())
+    duplicates = left_rows.height - left_first.height + right_rows.height - right_first.height
+
+    # Only the rows that differ come out of the join
+    joined = (left_first.lazy()
+              .join(right_first.lazy(), on='__key', how='full')
+              .filter(pl.col('__row').is_null() | pl.col('__row_right').is_null()
+                      | (pl.col('__hash') != pl.col('__hash_right')))
+              .collect())
+    check(cancelled)
+    removed = joined.filter(pl.col('__row_right').is_null())['__row']
+    added = joined.filter(pl.col('__row').is_null())['__row_right']
+    changed = (joined
+               .filter(pl.col('__row').is_not_null() & pl.col('__row_right').is_not_null())
+               .sort('__row'))
+
+    changed_left = changed['__row'].to_numpy()
+    changed_right = changed['__row_right'].to_numpy()
+    cells = changed_cells(left, right, changed_left, changed_right, columns, exprs, cancelled)
+
+    return TableDiff(key, np.sort(removed.to_numpy()), np.sort(added.to_numpy()),
+                     (changed_left, np.sort(changed_right)), cells, duplicates)
+
+def changed_cells(left, right, left_rows, right_rows, columns, exprs, cancelled=None) -> dict:
+    """
+    Rows on both sides where each column changed, the matched rows are read back and compared a chunk at a time
+    """
+    found = {column: ([], []) for column in columns}
+    for start in range(0, len(left_rows), chunk_rows):
+        check(cancelled)
+        lefts, rights = left_rows[start:start + chunk_rows], right_rows[start:start + chunk_rows]
+        left_values = left.gather(lefts, columns).select([exprs[column] for column in columns])
+        right_values = right.gather(rights, columns).select([exprs[column] for column in columns])
+        for column in columns:
+            flags = left_values[column].ne_missing(right_values[column]).to_numpy()
+            found[column][0].append(lefts[flags])
+            found[column][1].append(rights[flags])
+
+    return {column: tuple(np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64) for rows in sides)
+            for column, sides in found.items()}
+
+class DiffThread(QThread):
+    """
+    Diff thread that compares two tables and builds the highlights of both, the tables themselves are only read
+    """
+    diff_finished = pyqtSignal(object, object, object)
+    diff_failed = pyqtSignal(str)
+
+    def __init__(self, left, right, key):
+        super().__init__()
+        self.left = left
+        self.right = right
+        self.key = key
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Stop the comparison at its next step
+        """
+        self._cancelled.set()
+        return
+
+    def run(self) -> None:
+        """
+        Compare the tables and hand the differences back with the highlight mask of each side.
+        Any error ends the comparison with diff_failed so the window does not wait on it
+        """
+        try:
+            result = diff(self.left, self.right, self.key, self._cancelled.is_set)
+        except DiffCancelled:
+            self.diff_failed.emit("Comparison cancelled")
+            return
+        except Exception as e:
+            self.diff_failed.emit(str(e))
+            return
+
+        masks = [result.mask(side, source.height, source.columns)
+                 for side, source in enumerate((self.left, self.right))]
+        self.diff_finished.emit(result, *masks)
+        return
@@ -0,0 +1,85 @@
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PyQt5.QtCore import QThread, pyqtSignal
+
+def selected_ranges(selection) -> tuple:
+    """
+    Collapse a Qt selection into the view rows and column positions it covers,
+    each selection range is turned into rows at once instead of cell by cell
+    """
+    rows = [np.arange(area.top(), area.bottom() + 1, dtype=np.int64) for area in selection]
+    columns = sorted({column for area in selection for column in range(area.left(), area.right() + 1)})
+    rows = np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+    return rows, columns
+
+def take(source, rows, columns) -> pl.DataFrame:
+    """
+    Get rows of the table, rows that run in one piece are sliced instead of gathered
+    """
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and np.all(np.diff(rows) == 1):
+        return source.slice(int(rows[0]), len(rows), columns)
+    return source.gather(rows, columns)
+
+class ExportThread(QThread):
+    """
+    Writing thread that saves rows of a table to CSV or Parquet a chunk at a time,
+    only one chunk of the table is in memory at once
+    """
+    export_progress = pyqtSignal(int, int)
+    export_finished = pyqtSignal(str)
+    export_failed = pyqtSignal(str)
+
+    chunk_rows = 100_000
+
+    def __init__(self, source, rows, columns, file_path):
+        super().__init__()
+        self.source = source
+        self.rows = rows
+        self.columns = columns
+        self.file_path = file_path
+
+    def chunks(self):
+        """
+        Rows of the table in chunks, in the order they were given
+        """
+        for start in range(0, max(len(self.rows), 1), self.chunk_rows):
+            yield take(self.source, self.rows[start:start + self.chunk_rows], self.columns)
+            self.export_progress.emit(min(start + self.chunk_rows, len(self.rows)), len(self.rows))
+
+    def write_parquet(self) -> None:
+        """
+        Write every chunk as its own row group, chunks read with other types are cast to the types of the first
+        """
+        writer = None
+        try:
+            for df in self.chunks():
+                table = df.to_arrow()
+                if writer is None:
+                    writer = pq.ParquetWriter(self.file_path, table.schema)
+                elif not table.schema.equals(writer.schema):
+                    table = table.cast(writer.schema)
+                writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+
+    def run(self) -> None:
+        """
+        CSV and Parquet are both streamed to the file chunk by chunk
+        """
+        try:
+            if self.file_path.lower().endswith('.parquet'):
+                self.write_parquet()
+            else:
+                with open(self.file_path, 'wb') as file:
+                    for idx, df in enumerate(self.chunks()):
+                        df.write_csv(file, include_header=idx == 0)
+        except (OSError, pl.exceptions.PolarsError, pa.ArrowException) as e:
+            self.export_failed.emit(str(e))
+            return
+
+        self.export_finished.emit(self.file_path)
+        return
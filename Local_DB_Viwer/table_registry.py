@@ -0,0 +1,172 @@
+import os
+import uuid
+import threading
+import polars as pl
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class TableRegistry:
+    """
+    Tables of one viewer window: the table views, their models and the sources behind them.
+    Sources are kept in the order they were last viewed, once they use more memory than the
+    budget the least recently viewed ones are spilled to memory-mapped Arrow IPC files.
+    Spilling and reading back run on a worker so the window never waits on the disk
+    """
+
+    memory_budget = 8 * 1024 ** 3
+    user_path = os.path.expanduser("~")
+    spill_folder = os.path.join(user_path, "MAPS-Python", "Spilled Tables")
+
+    def __init__(self, memory_budget=None, spill_folder=None) -> None:
+        self.memory_budget = memory_budget if memory_budget is not None else self.memory_budget
+        self.spill_folder = spill_folder or self.spill_folder
+        self.models = {}
+        self.tables = {}
+        self.sources = OrderedDict()
+        self.spilled = {}
+        self.pending = set()
+        self._lock = threading.Lock()
+        # One worker keeps the spills and reloads of a table in the order they were asked for
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spill')
+
+    def register(self, source) -> None:
+        """
+        Track a loaded table, it counts as the most recently viewed one
+        """
+        with self._lock:
+            self.sources[source] = None
+            self.sources.move_to_end(source)
+        self.enforce(keep=source)
+        return
+
+    def view(self, source) -> None:
+        """
+        Table brought into focus, it is read back into memory if it was spilled.
+        The mapped copy serves the table until the reload is done
+        """
+        with self._lock:
+            if source not in self.sources:
+                return
+            self.sources.move_to_end(source)
+        self.worker.submit(self.reload, source)
+        self.enforce(keep=source)
+        return
+
+    def release(self, source) -> None:
+        """
+        Table no longer shown by any view: its search copy, indexes, sort orders and cached pages are
+        dropped and the table is spilled right away. It can still be opened again from its label
+        """
+        with self._lock:
+            if source not in self.sources:
+                return
+            self.sources.move_to_end(source, last=False)
+            self.pending.add(source)
+        source.release_caches()
+        self.worker.submit(self.spill, source)
+        return
+
+    def resident_size(self) -> int:
+        """
+        Estimated memory of the tables that are not spilled or about to be
+        """
+        with self._lock:
+            sources = [source for source in self.sources if source not in self.spilled and source not in self.pending]
+        return sum(source.estimated_size() for source in sources)
+
+    def enforce(self, keep=None) -> None:
+        """
+        Queue spills of the least recently viewed tables until the rest fit in the memory budget
+        """
+        total = self.resident_size()
+        with self._lock:
+            for source in list(self.sources):
+                if total <= self.memory_budget:
+                    break
+                if source is keep or source in self.spilled or source in self.pending:
+                    continue
+                self.pending.add(source)
+                self.worker.submit(self.spill, source)
+                total -= source.estimated_size()
+        return
+
+    def spill(self, source) -> None:
+        """
+        Worker side of a spill, tables forgotten or already spilled in the meantime are skipped
+        """
+        with self._lock:
+            self.pending.discard(source)
+            if source not in self.sources or source in self.spilled:
+                return
+
+        path = os.path.join(self.spill_folder, f"{uuid.uuid4().hex}.arrow")
+        try:
+            os.makedirs(self.spill_folder, exist_ok=True)
+            spilled = source.spill(path)
+        except (OSError, pl.exceptions.PolarsError) as e:
+            # Out of disk, the table stays in memory
+            print(f"Unable to spill table: {e}")
+            self.remove_file(path)
+            return
+
+        with self._lock:
+            keep = spilled and source in self.sources
+            if keep:
+                self.spilled[source] = path
+        if spilled and not keep:
+            self.remove_file(path)
+        return
+
+    def reload(self, source) -> None:
+        """
+        Worker side of a reload, the spilled copy is removed once the table is back in memory
+        """
+        with self._lock:
+            path = self.spilled.pop(source, None)
+        if path is None:
+            return
+
+        try:
+            source.reload(path)
+        except (OSError, pl.exceptions.PolarsError) as e:
+            # The mapped copy still serves the table
+            print(f"Unable to reload table: {e}")
+            with self._lock:
+                self.spilled[source] = path
+            return
+        self.remove_file(path)
+        return
+
+    def forget(self, source) -> None:
+        """
+        Stop tracking a table and remove its spilled copy
+        """
+        with self._lock:
+            self.sources.pop(source, None)
+            self.pending.discard(source)
+            path = self.spilled.pop(source, None)
+        if path is not None:
+            self.remove_file(path)
+        return
+
+    def close(self) -> None:
+        """
+        Forget every table of the window, queued spills of them are skipped and the running one is waited on
+        """
+        for source in list(self.sources):
+            self.forget(source)
+        self.worker.shutdown(wait=True, cancel_futures=True)
+        self.models.clear()
+        self.tables.clear()
+        return
+
+    def remove_file(self, path) -> None:
+        """
+        Remove a spilled copy, on some platforms it can not go while a search still maps it
+        """
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+        return
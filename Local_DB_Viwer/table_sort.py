@@ -0,0 +1,35 @@
+import numpy as np
+import polars as pl
+from PyQt5.QtCore import QThread, pyqtSignal
+
+def invert(permutation) -> np.ndarray:
+    """
+    Position of each table row in the sorted order
+    """
+    inverse = np.empty(len(permutation), dtype=np.int64)
+    inverse[permutation] = np.arange(len(permutation), dtype=np.int64)
+    return inverse
+
+class SortThread(QThread):
+    """
+    Sorting thread that works out the row order of a table, the table itself stays as it is
+    """
+    sort_finished = pyqtSignal(object, object, object)
+
+    def __init__(self, source, keys):
+        super().__init__()
+        self.source = source
+        self.keys = tuple(keys)
+
+    def run(self) -> None:
+        """
+        Get the sorted row order and its inverse and hand them back to the model
+        """
+        try:
+            permutation = self.source.sort_permutation(self.keys)
+        except pl.exceptions.PolarsError as e:
+            print(f"Unable to sort: {e}")
+            return
+
+        self.sort_finished.emit(self.keys, permutation, invert(permutation))
+        return
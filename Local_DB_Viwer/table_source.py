@@ -0,0 +1,436 @@
+import weakref
+import threading
+import numpy as np
+import polars as pl
+from collections import OrderedDict, defaultdict
+
+# Local import
+import Local_DB_Viwer.ngram_index as ngram_index
+import Local_DB_Viwer.column_index as column_index
+import Local_DB_Viwer.csv_cache as csv_cache
+
+class FrameSource:
+    """
+    Table source for a dataframe that is fully loaded into memory
+    """
+
+    pushdown = False
+    # Free text searches on a column before it gets a trigram index
+    index_after = 2
+    # Rows of a row order read at a time when painting it, 0 when scattered rows are cheap to get
+    gather_window = 0
+
+    def __init__(self, dataframe) -> None:
+        self.dataframe = dataframe
+        self._normalized = None
+        self._normalize_lock = threading.Lock()
+        self.spilled = False
+        self.init_caches()
+
+    def init_caches(self) -> None:
+        """
+        Sort orders, text indexes and column indexes worked out for the table
+        """
+        self._permutations = {}
+        self._text_indexes = {}
+        self._column_indexes = {}
+        self._text_searches = defaultdict(int)
+        self._index_lock = threading.Lock()
+        return
+
+    def __len__(self) -> int:
+        return self.height
+
+    @property
+    def height(self) -> int:
+        return self.dataframe.height
+
+    @property
+    def columns(self) -> list:
+        return self.dataframe.columns
+
+    @property
+    def schema(self) -> pl.Schema:
+        return self.dataframe.schema
+
+    def is_empty(self) -> bool:
+        """
+        Check if there is any data to show
+        """
+        return self.height == 0 or not self.columns
+
+    def lazy(self) -> pl.LazyFrame:
+        """
+        Lazy query over the table used for searching
+        """
+        return self.dataframe.lazy()
+
+    def rename(self, mapping) -> 'FrameSource':
+        """
+        Rename the columns of the table
+        """
+        return FrameSource(self.dataframe.rename(mapping))
+
+    def normalized(self) -> pl.LazyFrame:
+        """
+        Search copy of the table with lowercased text columns. It is made once and shared by every
+        search, the other columns are not copied
+        """
+        with self._normalize_lock:
+            if self.spilled:
+                return lowercase(self.dataframe.lazy())
+            if self._normalized is None:
+                self._normalized = lowercase(self.dataframe.lazy()).collect()
+        return self._normalized.lazy()
+
+    def search_frame(self) -> tuple:
+        """
+        Frame the search runs over and if its text columns are already lowercased.
+        A spilled table is searched from its mapped file, lowercasing inside the query like a scan
+        """
+        if self.spilled:
+            return self.dataframe.lazy(), False
+        return self.normalized(), True
+
+    def prepare_search(self) -> None:
+        """
+        Build the search copy in the background so the first search does not wait on it
+        """
+        if self.spilled:
+            return
+        threading.Thread(target=self.normalized, daemon=True).start()
+        return
+
+    def estimated_size(self) -> int:
+        """
+        Memory the table and its search copy take up
+        """
+        size = self.dataframe.estimated_size()
+        if self._normalized is not None:
+            size += self._normalized.estimated_size()
+        return size
+
+    def spill(self, path) -> bool:
+        """
+        Move the table out of memory into an Arrow IPC file that is read memory-mapped from then on.
+        The search copy and indexes are dropped, no search copy is made until the table is reloaded
+        """
+        self.dataframe.write_ipc(path, compression='uncompressed')
+        with self._normalize_lock:
+            # Uncompressed IPC files are read memory-mapped, the pages stay with the file
+            self.dataframe = pl.read_ipc(path)
+            self._normalized = None
+            self.spilled = True
+        with self._index_lock:
+            self._text_indexes = {}
+            self._column_indexes = {}
+        return True
+
+    def reload(self, path) -> None:
+        """
+        Read a spilled table back into memory, the scan copies it out of the mapped file
+        """
+        dataframe = pl.scan_ipc(path).collect()
+        with self._normalize_lock:
+            self.dataframe = dataframe
+            self.spilled = False
+        self.prepare_search()
+        return
+
+    def release_caches(self) -> None:
+        """
+        Drop everything worked out for the table once no view shows it, it is rebuilt when viewed again
+        """
+        with self._normalize_lock:
+            self._normalized = None
+        self.drop_indexes()
+        return
+
+    def drop_indexes(self) -> None:
+        """
+        Forget the sort orders, indexes and search counts of the table
+        """
+        with self._index_lock:
+            self._permutations = {}
+            self._text_indexes = {}
+            self._column_indexes = {}
+            self._text_searches = defaultdict(int)
+        return
+
+    def cell(self, row, column) -> object:
+        """
+        Get a single value from the table
+        """
+        return self.dataframe[row, column]
+
+    def slice(self, offset, length, columns=None) -> pl.DataFrame:
+        """
+        Get a block of rows, only for the columns asked for
+        """
+        df = self.dataframe.slice(offset, length)
+        return df.select(columns) if columns is not None else df
+
+    def gather(self, rows, columns=None) -> pl.DataFrame:
+        """
+        Get the rows at the given positions in the order they were given
+        """
+        df = self.dataframe.select(columns) if columns is not None else self.dataframe
+        return df[rows] if len(rows) else df.clear()
+
+    def column_frame(self, columns) -> pl.DataFrame:
+        """
+        Only the given columns of the whole table, in table order
+        """
+        return self.dataframe.select(columns)
+
+    def sort_permutation(self, keys) -> np.ndarray:
+        """
+        Row positions in sorted order for (column, descending) keys. Each sort is worked out once
+        and kept for the life of the table, the table itself is never reordered
+        """
+        keys = tuple(keys)
+        if keys in self._permutations:
+            return self._permutations[keys]
+
+        columns = [column for column, _ in keys]
+        order = pl.arg_sort_by(columns, descending=[descending for _, descending in keys],
+                               nulls_last=True, maintain_order=True)
+        permutation = self.column_frame(columns).select(order).to_series().cast(pl.Int64).to_numpy()
+        self._permutations[keys] = permutation
+        return permutation
+
+    def text_indexes(self, columns) -> dict:
+        """
+        Trigram indexes that are ready for the given columns
+        """
+        return {column: self._text_indexes[column] for column in columns
+                if self._text_indexes.get(column) is not None}
+
+    def note_text_search(self, columns) -> None:
+        """
+        Columns searched as free text again and again get a trigram index built in the background
+        """
+        build = []
+        with self._index_lock:
+            for column in columns:
+                self._text_searches[column] += 1
+                if self._text_searches[column] >= self.index_after and column not in self._text_indexes:
+                    self._text_indexes[column] = None
+                    build.append(column)
+
+        for column in build:
+            threading.Thread(target=self.build_text_index, args=(column,), daemon=True).start()
+        return
+
+    def build_text_index(self, column) -> None:
+        """
+        Index a text column, the column is searched by scanning until the index is ready
+        """
+        try:
+            index = ngram_index.TrigramIndex.build(self.column_frame([column]).to_series())
+        except pl.exceptions.PolarsError as e:
+            print(f"Unable to index {column}: {e}")
+            return
+
+        with self._index_lock:
+            self._text_indexes[column] = index
+        return
+
+    def column_index(self, column) -> object:
+        """
+        Secondary index of a filtered column. The first filter on a column starts building it
+        in the background and scans, later filters use it once it is ready
+        """
+        with self._index_lock:
+            if column in self._column_indexes:
+                return self._column_indexes[column]
+            if not column_index.indexable(self.schema[column]):
+                return None
+            self._column_indexes[column] = None
+
+        threading.Thread(target=self.build_column_index, args=(column,), daemon=True).start()
+        return None
+
+    def build_column_index(self, column) -> None:
+        """
+        Index a column for equality or range filters
+        """
+        try:
+            index = column_index.build(self.column_frame([column]).to_series())
+        except pl.exceptions.PolarsError as e:
+            print(f"Unable to index {column}: {e}")
+            return
+
+        with self._index_lock:
+            self._column_indexes[column] = index
+        return
+
+class LazySource(FrameSource):
+    """
+    Table source that keeps the LazyFrame and only collects the rows that are being looked at
+    """
+
+    page_rows = 1000
+    max_pages = 16
+    # Scattered rows are scanned for, so sorted views are read a window at a time
+    gather_window = 65_536
+
+    def __init__(self, lazyframe, height=None, files=()) -> None:
+        self.lazyframe = lazyframe
+        # Cached files the scan reads, held until the source is gone
+        self.files = tuple(files)
+        csv_cache.CsvCache.hold(self.files)
+        weakref.finalize(self, csv_cache.CsvCache.release, self.files)
+        self._schema = lazyframe.collect_schema()
+        self._height = height if height is not None else lazyframe.select(pl.len()).collect().item()
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.init_caches()
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def columns(self) -> list:
+        return self._schema.names()
+
+    @property
+    def schema(self) -> pl.Schema:
+        return self._schema
+
+    def lazy(self) -> pl.LazyFrame:
+        """
+        Lazy query over the table used for searching, filters are pushed into the scan
+        """
+        return self.lazyframe
+
+    def rename(self, mapping) -> 'LazySource':
+        """
+        Rename the columns of the table without collecting it
+        """
+        return LazySource(self.lazyframe.rename(mapping), self._height, self.files)
+
+    def normalized(self) -> pl.LazyFrame:
+        """
+        Lowercase the text columns as part of the scan, only the searched columns get rewritten
+        and nothing is kept in memory
+        """
+        return lowercase(self.lazy())
+
+    def search_frame(self) -> tuple:
+        """
+        Searches lowercase the compared columns inside the query, so the scan only reads
+        the searched columns and the rows that pass the filter
+        """
+        return self.lazy(), False
+
+    def prepare_search(self) -> None:
+        return
+
+    def page(self, page) -> pl.DataFrame:
+        """
+        Collect a page of rows, recently used pages are kept around for painting
+        """
+        with self._lock:
+            if page in self._pages:
+                self._pages.move_to_end(page)
+                return self._pages[page]
+
+        df = self.lazyframe.slice(page * self.page_rows, self.page_rows).collect()
+        with self._lock:
+            self._pages[page] = df
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return df
+
+    def estimated_size(self) -> int:
+        """
+        Memory of the cached pages, the rest of the table stays in the scanned file
+        """
+        with self._lock:
+            return sum(df.estimated_size() for df in self._pages.values())
+
+    def spill(self, path) -> bool:
+        """
+        Drop the cached pages, they are collected again from the scan when viewed
+        """
+        with self._lock:
+            self._pages.clear()
+        return False
+
+    def release_caches(self) -> None:
+        """
+        Drop the cached pages and everything worked out for the table once no view shows it
+        """
+        with self._lock:
+            self._pages.clear()
+        self.drop_indexes()
+        return
+
+    def cell(self, row, column) -> object:
+        """
+        Get a single value from the page the row belongs to
+        """
+        page, offset = divmod(row, self.page_rows)
+        return self.page(page)[offset, column]
+
+    def slice(self, offset, length, columns=None) -> pl.DataFrame:
+        """
+        Collect a block of rows, only for the columns asked for
+        """
+        lf = self.lazyframe.select(columns) if columns is not None else self.lazyframe
+        return lf.slice(offset, length).collect()
+
+    def gather(self, rows, columns=None) -> pl.DataFrame:
+        """
+        Collect the rows at the given positions in the order they were given. Rows from a few
+        pages come out of the page cache, anything wider is read in one pass over the part of the
+        scan between the first and last wanted row, keeping only the wanted rows. Views read
+        scattered rows a window at a time, see gather_window
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        pages = np.unique(rows // self.page_rows)
+        if not len(rows):
+            return self.slice(0, 0, columns)
+        if len(pages) <= self.max_pages // 2:
+            df = pl.concat([self.page(int(page)) for page in pages], how='vertical_relaxed')
+            positions = np.searchsorted(pages, rows // self.page_rows) * self.page_rows + rows % self.page_rows
+            df = df[positions]
+            return df.select(columns) if columns is not None else df
+
+        # Matched rows come in table order, so a window of them only covers part of the file
+        wanted = np.unique(rows)
+        low, high = int(wanted[0]), int(wanted[-1])
+        lf = self.lazyframe.select(columns) if columns is not None else self.lazyframe
+        df = (lf
+              .slice(low, high - low + 1)
+              .with_row_index('__row', offset=low)
+              .filter(pl.col('__row').cast(pl.Int64).is_in(pl.Series(wanted)))
+              .drop('__row')
+              .collect())
+        return df[np.searchsorted(wanted, rows)]
+
+    def column_frame(self, columns) -> pl.DataFrame:
+        """
+        Collect only the given columns of the whole table
+        """
+        return self.lazyframe.select(columns).collect()
+
+def lowercase(lazyframe) -> pl.LazyFrame:
+    """
+    Lowercase every text column, searches are not case sensitive.
+    Categorical columns stay categorical so comparing them stays a code lookup
+    """
+    return lazyframe.with_columns(pl.col(pl.String).str.to_lowercase(),
+                                  pl.col(pl.Categorical).cast(pl.String).str.to_lowercase().cast(pl.Categorical))
+
+def to_source(data) -> FrameSource:
+    """
+    Wrap loaded data into the matching table source
+    """
+    if isinstance(data, FrameSource):
+        return data
+    if isinstance(data, pl.LazyFrame):
+        return LazySource(data)
+    return FrameSource(data)
@@ -1,92 +1,131 @@
 import os
-import re
-import itertools
+import numpy as np
 import polars as pl
-from collections import defaultdict
-from sqlalchemy import create_engine, MetaData
 from PyQt5.QtGui import QColor, QDropEvent, QDragEnterEvent
-from PyQt5.QtCore import Qt, QAbstractTableModel, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton,\
                             QLineEdit, QTableView, QCheckBox, QScrollArea,\
-                            QTabWidget, QSplitter, QFileDialog, QLabel, QDialog
+                            QTabWidget, QSplitter, QFileDialog, QLabel, QDialog,\
+                            QHeaderView, QAbstractItemView, QApplication, QSpinBox, QProgressBar,\
+                            QInputDialog
+
+# Local import
+import Local_DB_Viwer.table_source as table_source
+import Local_DB_Viwer.file_loader as file_loader
+import Local_DB_Viwer.csv_cache as csv_cache
+import Local_DB_Viwer.db_source as db_source
+import Local_DB_Viwer.highlight as highlight
+import Local_DB_Viwer.search_engine as search_engine
+import Local_DB_Viwer.block_cache as block_cache
+import Local_DB_Viwer.table_sort as table_sort
+import Local_DB_Viwer.table_export as table_export
+import Local_DB_Viwer.table_registry as table_registry
+import Local_DB_Viwer.table_diff as table_diff
+
+# Qt keeps the pixel height of all rows in an int, so a view reports at most this many rows
+# (rows of up to 64 pixels). Taller tables are shown through a window of this many rows
+max_view_rows = 2 ** 31 // 64
 
 class MyTableModel(QAbstractTableModel):
-    def __init__(self, data):
+    """
+    Read only view of some rows of a table, the rows are painted from the table source as they
+    are viewed so nothing gets copied no matter how many rows there are
+    """
+
+    def __init__(self, data, rows=None, columns=None):
         super(MyTableModel, self).__init__()
-        self._data = data
+        self.source = table_source.to_source(data)
+        self.rows = rows
+        self.columns = columns if columns is not None else self.source.columns
+        self.block_cache = block_cache.BlockCache(self.source, self.columns)
+        self.block_cache.set_rows(rows)
 
     def rowCount(self, parent=None):
-        return len(self._data)
+        # Results past the row limit of Qt are not listed, the table itself still shows them
+        return min(len(self.rows) if self.rows is not None else len(self.source), max_view_rows)
 
     def columnCount(self, parent=None):
-        return len(self._data.columns)
+        return len(self.columns)
 
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return str(self._data[index.row(), index.column()])
+            return self.block_cache.text(index.row(), index.column())
         return 
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
             if orientation == Qt.Horizontal:
-                return str(self._data.columns[section])
-
-class SearchThread(QThread):
-    """
-    Searching thread to organize data into QModelIndexes
-    """
-    search_finished = pyqtSignal(list)
-
-    def __init__(self, table, data_dict):
-        super().__init__()
-        self.data_dict = data_dict
-        self.table = table
-        self.data_dict = data_dict
+                return str(self.columns[section])
 
-    def run(self) -> None:
+    def source_row(self, row) -> int:
         """
-        Recieve index values of the searched data
+        Row of the table shown at a row of the view
         """
-        index_values = self.search_text_in_dataframe([])
-        self.search_finished.emit(index_values)
-        return
-
-    def search_text_in_dataframe(self, highlighted_cells) -> list:  
-        """
-        Store the QModelIndex objects corresponding to the matched rows in dataframe
-        """
-        for key, value in (
-            itertools.chain.from_iterable(
-                (itertools.product((k,), v) for k, v in self.data_dict.items()))):
-                    highlighted_cells.append(self.table.index(key-1, value))
-        return highlighted_cells
+        return int(self.rows[row]) if self.rows is not None else row
 
 class DataFrameTableModel(QAbstractTableModel):
     """
     Created QAbstractionTableModel that each dataframe loaded in utilizes
     """
+    search_counted = pyqtSignal(int, bool)
+    search_progressed = pyqtSignal(int, int)
 
     text = None
+    # 'query' parses the text, 'text' and 'regex' look for it in every shown text column
+    search_mode = 'query'
+    # Progressive searches show hits block by block and stop after match_limit matches when it is set
+    progressive = False
+    match_limit = 0
     _bool = False
     visible_rows = 500
-    highlighted_cells = []
+    # Report every row and paint the ones in view from the source, otherwise rows are fetched in batches
+    virtual = True
     result = pl.DataFrame()
     
-    def __init__(self, dataframe, column_checkboxes, parent=None) -> QAbstractTableModel:
+    def __init__(self, source, column_checkboxes, parent=None) -> QAbstractTableModel:
         super(DataFrameTableModel, self).__init__(parent)
 
         self.column_checkboxes = column_checkboxes
-        self._dataframe = dataframe
+        self.source = table_source.to_source(source)
+        self.highlights = highlight.HighlightMask(self.source.height)
+        self.matched_rows = np.empty(0, dtype=np.int64)
+        self.block_cache = block_cache.BlockCache(self.source)
+
+        # Sorted order of the rows, the source is never reordered
+        self.sort_keys = ()
+        self.permutation = None
+        self.inverse = None
+        self.sort_threads = set()
+
+        # Only the newest search is shown, the last shown one is kept for narrowing the next
+        self.search_generation = 0
+        self.progress_generation = 0
+        self.last_search = None
+
+        # Source rows in view order when sorted or only showing matches, None is the table order
+        self.show_matches = False
+        self.row_map = None
+        self.row_keys = None
+
+        # First view row Qt is shown, only moves for tables over max_view_rows
+        self.window_start = 0
         
         # Set the visible row count
         self.update_visible_columns()
 
     def rowCount(self, parent=None) -> int:    
         """
-        Row counter that factors in batch size loading
+        Row counter that factors in batch size loading and the row limit of Qt
+        """
+        if self.virtual:
+            return min(self.total_rows(), max_view_rows)
+        return min(self.visible_rows, self.total_rows(), max_view_rows)
+
+    def total_rows(self) -> int:
+        """
+        Rows in the view, only the matched rows when showing matches
         """
-        # TODO: Use with checkbox
-        return min(self.visible_rows, len(self._dataframe))
+        return len(self.row_map) if self.row_map is not None else len(self.source)
     
     def update_visible_columns(self) -> None: 
         """
@@ -94,6 +133,7 @@ class DataFrameTableModel(QAbstractTableModel):
         """
         if self.column_checkboxes is not None:
             self.visible_columns = [col for col, checkbox in self.column_checkboxes.items() if checkbox.isChecked()]
+            self.block_cache.set_columns(self.visible_columns)
             self.layoutChanged.emit()
         return
 
@@ -102,13 +142,11 @@ class DataFrameTableModel(QAbstractTableModel):
         Sets up the table from the dataframes
         """
         if role == Qt.DisplayRole:
-            if self.column_checkboxes is not None:
-                column_index = self.visible_columns[index.column()]
-                return str(self._dataframe[index.row(), column_index])
-            return str(self._dataframe[index.row(), index.column()])
+            return self.block_cache.text(index.row() + self.window_start, index.column())
 
         if role == Qt.BackgroundRole:
-            if index in self.highlighted_cells:
+            column = self.headerData(index.column(), Qt.Horizontal)
+            if self.highlights.contains(self.source_row(index.row()), column):
                 return QColor("yellow")
         return
 
@@ -116,7 +154,7 @@ class DataFrameTableModel(QAbstractTableModel):
         """
         Column total from dataframe
         """
-        return len(self.visible_columns) if self.column_checkboxes else len(self._dataframe.columns)
+        return len(self.visible_columns) if self.column_checkboxes else len(self.source.columns)
 
     def headerData(self, section, orientation, role=Qt.DisplayRole) -> None:
         """
@@ -126,28 +164,164 @@ class DataFrameTableModel(QAbstractTableModel):
             if orientation == Qt.Horizontal:
                 if self.column_checkboxes:
                     return str(self.visible_columns[section])
-                return str(self._dataframe.columns[section])
+                return str(self.source.columns[section])
     
-    def current_dataframe(self) -> pl.DataFrame:
+    def source_row(self, row) -> int:
         """
-        Get the current dataframe from the table, this also factors in hidden rows
+        Row of the source shown at a row of the view
         """
-        visible_columns = [col for col, checkbox in self.column_checkboxes.items() if checkbox.isChecked()]
-        df = pl.DataFrame(self._dataframe[visible_columns])
+        row += self.window_start
+        return int(self.row_map[row]) if self.row_map is not None else row
 
-        # TODO Should only process once as the dataframes are not changing
-        dataframe = df.with_columns(
-            [pl.col(column).str.to_lowercase() for column in df.columns if df[column].dtype == pl.Utf8]
-        )
-        return dataframe
+    def source_rows(self, rows) -> np.ndarray:
+        """
+        Rows of the source shown at an array of view rows
+        """
+        rows = rows + self.window_start
+        return self.row_map[rows] if self.row_map is not None else rows
+
+    def view_position(self, row) -> int:
+        """
+        Position of a source row in the whole view order, -1 when it is filtered out
+        """
+        key = int(self.inverse[row]) if self.inverse is not None else row
+        if not self.show_matches:
+            return key
+
+        # Matched rows are kept in view order, so their sort positions only ever go up
+        position = int(np.searchsorted(self.row_keys, key))
+        if position < len(self.row_keys) and self.row_keys[position] == key:
+            return position
+        return -1
+
+    def view_row(self, row) -> int:
+        """
+        Row of the view a source row is shown at, -1 when it is filtered out or outside the window
+        """
+        position = self.view_position(row)
+        if position < 0 or not 0 <= position - self.window_start < max_view_rows:
+            return -1
+        return position - self.window_start
+
+    def shift_window(self, rows) -> int:
+        """
+        Move the window of rows Qt is shown, returns how many rows it actually moved
+        """
+        start = min(max(self.window_start + rows, 0), max(self.total_rows() - max_view_rows, 0))
+        moved = start - self.window_start
+        if moved:
+            def update() -> None:
+                self.window_start = start
+                return
+
+            self.remap(update)
+        return moved
+
+    def window_row(self, position) -> int:
+        """
+        Row of the view a view position is shown at, the window is moved over it when it is outside
+        """
+        if not 0 <= position - self.window_start < max_view_rows:
+            self.shift_window(position - max_view_rows // 2 - self.window_start)
+        return position - self.window_start
+
+    def update_rows(self) -> None:
+        """
+        Work out the view order from the sort and the matched rows
+        """
+        if self.show_matches:
+            rows = self.matched_rows
+            keys = self.inverse[rows] if self.inverse is not None else rows
+            order = np.argsort(keys, kind='stable')
+            self.row_map, self.row_keys = rows[order], keys[order]
+        else:
+            self.row_map, self.row_keys = self.permutation, None
+        self.window_start = min(self.window_start, max(self.total_rows() - max_view_rows, 0))
+        self.block_cache.set_rows(self.row_map)
+        return
+
+    def remap(self, update) -> None:
+        """
+        Change the rows of the view, selections stay on the rows they were on while they are still shown
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        rows = [self.source_row(index.row()) for index in persistent]
+
+        update()
+        self.update_rows()
+
+        moved = []
+        for row, index in zip(rows, persistent):
+            view_row = self.view_row(row)
+            moved.append(self.index(view_row, index.column()) if view_row >= 0 else QModelIndex())
+        self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
+        return
+
+    def set_show_matches(self, show_matches) -> None:
+        """
+        Switch between only the matched rows and the whole table
+        """
+        def update() -> None:
+            self.show_matches = show_matches
+            return
+
+        self.remap(update)
+        return
+
+    def sort(self, column, order=Qt.AscendingOrder) -> None:
+        """
+        Sort on a header click in the background. Shift click adds the column to the sort keys,
+        a column below zero goes back to the table order
+        """
+        if column < 0:
+            self.sort_keys = ()
+            self.apply_sort((), None, None)
+            return
+
+        name = self.headerData(column, Qt.Horizontal)
+        key = (name, order == Qt.DescendingOrder)
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            keys = [k for k in self.sort_keys if k[0] != name]
+            self.sort_keys = tuple(keys + [key])
+        else:
+            self.sort_keys = (key,)
+
+        # Header clicks can ask for the same sort twice
+        if any(thread.keys == self.sort_keys for thread in self.sort_threads):
+            return
+
+        # Running sorts are kept until they finish, a newer sort only makes their result stale
+        thread = table_sort.SortThread(self.source, self.sort_keys)
+        thread.sort_finished.connect(self.apply_sort)
+        thread.finished.connect(lambda thread=thread: self.sort_threads.discard(thread))
+        self.sort_threads.add(thread)
+        thread.start()
+        return
+
+    def apply_sort(self, keys, permutation, inverse) -> None:
+        """
+        Show the rows in sorted order, selections and highlights follow the rows they were on
+        """
+        # A newer sort was started while this one ran
+        if keys != self.sort_keys:
+            return
+
+        def update() -> None:
+            self.permutation, self.inverse = permutation, inverse
+            return
+
+        self.remap(update)
+        return
 
     def getColumnName(self, columnIndex) -> None:
         """
         Get the column name of specific selected column
         """
 
-        if 0 <= columnIndex < len(self._dataframe.columns):
-            return str(self._dataframe.columns[columnIndex])
+        if 0 <= columnIndex < len(self.source.columns):
+            return str(self.source.columns[columnIndex])
         return
 
     def uncheck_all_other_columns(self, col_name) -> None:
@@ -161,195 +335,135 @@ class DataFrameTableModel(QAbstractTableModel):
                 checkbox.setChecked(False)
         return
 
+    def canFetchMore(self, index) -> bool:
+        """
+        Only batch loaded models have more rows to fetch
+        """
+        return not self.virtual and self.visible_rows < self.total_rows()
+
     def fetchMore(self, index) -> None:
         """
         This fetches the next 100 rows that need to be loaded in
         """
+        if self.virtual:
+            return
         
         # Get the remaining rows to load up
-        remaining_rows = len(self._dataframe) - self.visible_rows
+        remaining_rows = self.total_rows() - self.visible_rows
         rows_to_fetch = min(100, remaining_rows)
+        if rows_to_fetch <= 0:
+            return
         
         # Insert the rows at the end of the previously loaded values and insert the next 100
-        self.beginInsertRows(index, self.visible_rows, len(self._dataframe) - 1)
+        self.beginInsertRows(index, self.visible_rows, self.visible_rows + rows_to_fetch - 1)
         self.visible_rows += rows_to_fetch
         self.endInsertRows()
         return
-    
-    def update_search_text(self) -> int:
-        """
-        Update the searched results by highlighting specific columns
-        """
-        data_dict = {} 
-        value = re.findall(r'\([^()]*\)|[^()]+', self.text.lower())
-    
-        for val in value:
-            self.index_dict, found_items = self.match_bool(val, data_dict) 
-
-        # Start the search thread
-        self.search_thread = SearchThread(self, self.index_dict)
-        self.search_thread.search_finished.connect(self.handle_search_results)
-        self.search_thread.start()
-        return found_items
-        
-    def index_row(self, df, columns, data_dict) -> dict:
-        """
-        Fill in the data dictionary with row indexes and column index for each found item
-        """
-        # Get the index values to iterate through
-        rows = df['index'].to_list()
-        cols = df.get_column_index(columns)
-
-        for row in rows:
-            if row in data_dict:
-                data_dict[row].append(cols)
-            else:
-                data_dict[row] = [cols]
-        return data_dict
-
-    def dynamic_expr(self, operator, value, column, filter_expr) -> filter:
-        """
-        Dynamically setup the expressions
-        """
-        # TODO Remove case senstive boundaries for data itself
-        if value.isdigit():
-            match operator:
-                case '=':
-                    filter_expr = pl.col(column) == int(value)
-                case '>':
-                    filter_expr = pl.col(column) > int(value)
-                case '<':
-                    filter_expr = pl.col(column) < int(value)
-                case '>=':
-                    filter_expr = pl.col(column) >= int(value)
-                case '<=':
-                    filter_expr = pl.col(column) <= int(value)
-                case '!=':
-                    filter_expr = pl.col(column) != int(value)
-                case _ :
-                    print(f"Invalid operator: {operator}")
-            return filter_expr
-        
-        # If value is not a digit
-        match operator:
-            case '=': 
-                filter_expr = pl.col(column) == value
-            case '!=':
-                filter_expr = pl.col(column) != value
-            case _ :
-                print(f"Invalid operator: {operator}")
-        return filter_expr
 
-    def process_filter(self, df, col, data_dict, combined_filter):      
+    def fetch_to(self, row) -> None:
         """
-        Process dataframe and index rows
+        Make sure a row is loaded in one insert, batch loaded models can jump ahead without fetching each batch
         """
-
-        df = df.filter(combined_filter)
-        data_dict = self.index_row(df, col, data_dict)
-        return data_dict
+        if self.virtual or row < self.visible_rows or row >= self.total_rows():
+            return
+        self.beginInsertRows(QModelIndex(), self.visible_rows, row)
+        self.visible_rows = row + 1
+        self.endInsertRows()
+        return
     
-    def multi_filter(self, _bool, filter_expr, combined_filter) -> filter:
+    def update_search_text(self, live=False) -> None:
         """
-        Process the and/or operations and return expression
+        Search the whole table on the shared search workers, the highlights and found count come back
+        through handle_search_results. Only the newest search of the table is ever applied
         """
-        if not _bool:
-            combined_filter = filter_expr if combined_filter is None else combined_filter & filter_expr
-        else:
-            combined_filter = filter_expr if combined_filter is None else combined_filter | filter_expr
-        return combined_filter
+        self.search_generation += 1
+        columns = self.visible_columns if self.column_checkboxes else self.source.columns
+        request = search_engine.SearchRequest(self.text, self.search_mode, columns, self.search_generation, live,
+                                              self.progressive, self.match_limit if self.progressive else 0)
+        search_engine.SearchExecutor.shared().submit(self, self.source, request, self.handle_search_results,
+                                                     self.last_search, self.handle_search_progress)
+        return
 
-    def condition_set(self, val, df, condition, combined_filter, data_dict, _bool) -> dict:
+    def handle_search_progress(self, request, result, searched) -> None:
         """
-        Split the conditions up into sets and combine back together
+        Add the hits of a searched block, the first block of a search clears the last search
         """
+        def update() -> None:
+            if request.generation != self.progress_generation:
+                self.progress_generation = request.generation
+                self.matched_rows = np.empty(0, dtype=np.int64)
+                self.highlights = highlight.HighlightMask(self.source.height)
 
-        # Regex pattern checking for conditions
-        pattern = r'\s*([^\s=><!]+)\s*([=><!]+)\s*([^\s=><!]+)\s*'
-
-        # Check for matches in the conditional statement
-        for cond_set in condition:
-            matches = re.findall(pattern, cond_set)
-            for match in matches:
-                col = re.sub(r"\(|\)", "", match[0].strip())
-                op = re.sub(r"\(|\)", "", match[1].strip())
-                val = re.sub(r"\(|\)", "", match[2].strip())
-            
-            # Process multi-conditions
-            filter_expr = self.dynamic_expr(op, val, col, None)
-            combined_filter = self.multi_filter(_bool, filter_expr, combined_filter)
-            data_dict = self.process_filter(df, col, data_dict, combined_filter)
+            self.matched_rows = np.concatenate([self.matched_rows, result.rows])
+            for column, rows in result.hits.items():
+                self.highlights.set_rows(column, rows)
+            return
 
-        # Process the new data dictionary
-        data_dict = self.process_filter(df, col, data_dict, combined_filter)
-        total_items = self.found_items(combined_filter)
-        return data_dict, total_items
+        self.remap(update)
+        self.search_counted.emit(self.matched_rows.size, False)
+        self.search_progressed.emit(searched, len(self.source))
+        return
 
-    def match_bool(self, val, data_dict) -> dict:
+    def handle_search_results(self, request, result, mask) -> None:
         """
-        Detect whether the condition is split between and/or condition or none
+        Apply the matched rows and highlight mask built by the search workers
         """
+        # Half typed live query, the last results stay up
+        if result is None:
+            self.search_counted.emit(self.matched_rows.size, True)
+            return
+        self.last_search = (request, result)
 
-        combined_filter = None
-        dataframe = self.current_dataframe()
-        df = dataframe[:self.visible_rows]
-        
-        # Check what type of condition to apply to the statement
-        if 'and' in val:
-            condition = re.split(r'(?:and|&|,)', val)
-            return self.condition_set(val, df, condition, 
-                                      combined_filter,
-                                      data_dict, False)
-        elif 'or' in val:
-            condition = re.split(r'\bor\b', val)
-            return self.condition_set(val, df, condition,
-                                      combined_filter,
-                                      data_dict, True)
-        else:
-            col, op, val = map(str.strip, val.split())
-            filter_expr = self.dynamic_expr(op, val, col, None)
+        def update() -> None:
+            self.matched_rows = result.rows
+            self.highlights = mask
+            return
 
-        # If there is no AND / OR statement
-        if filter_expr is not None:
-            total_items = self.found_items(filter_expr)
-            filter_data = df.filter(filter_expr)
-            data_dict = self.index_row(filter_data, col, data_dict)
-            return data_dict, total_items
+        self.remap(update)
+        self.search_counted.emit(result.count, True)
         return
 
-    def found_items(self, dynam_expr) -> int:
+    def show_highlights(self, rows, mask) -> None:
         """
-        Get total found items to fill in the index label
+        Show rows and highlights worked out outside of a search, like the differences to another table.
+        Searches still running on the table are dropped
         """
+        search_engine.SearchExecutor.shared().cancel(self)
+        self.search_generation += 1
+        self.last_search = None
 
-        dataframe = self.current_dataframe()
-        return len(dataframe.filter(dynam_expr))
-
-    def handle_search_results(self, index_values) -> None:
-        """
-        Apply the newly converted dataframe index values to qmodelindex to be highlighted
-        """
+        def update() -> None:
+            self.matched_rows = rows
+            self.highlights = mask
+            return
 
-        self.highlighted_cells = index_values
-        self.layoutChanged.emit()
+        self.remap(update)
+        self.search_counted.emit(len(rows), True)
         return
 
     def get_result(self) -> pl.DataFrame:
         """
-        Populate the results window
+        Matched rows of the table, gathered in one go
+        """
+        return self.source.gather(self.matched_rows) if self.text else pl.DataFrame()
+
+    def result_model(self) -> MyTableModel:
+        """
+        Results window view over the matched rows, the rows are only read as they are viewed
         """
-        return pl.concat([self._dataframe[key-1] for key in self.index_dict]) if self.text else pl.DataFrame()
+        rows = self.matched_rows if self.text else np.empty(0, dtype=np.int64)
+        columns = self.visible_columns if self.column_checkboxes else self.source.columns
+        return MyTableModel(self.source, rows, columns)
 
 class ExpandableText(QWidget):
     """
     Setup the expandable text checkboxes and setup their individual tables that are loaded in
     """
     
-    saved_data = None
     is_expanded = False
     first_split = False
     
-    def __init__(self, data_obj, tab_widget, dataframe, csv_name, index) -> QWidget:
+    def __init__(self, data_obj, tab_widget, source, csv_name, index, visible=None) -> QWidget:
         super().__init__()
 
         self.data_obj = data_obj
@@ -357,11 +471,12 @@ class ExpandableText(QWidget):
         self.model_dict = data_obj.model_dict
         self.table_dict = data_obj.table_dict
         self.tab_widget = tab_widget
-        self.dataframe = dataframe
+        self.source = table_source.to_source(source)
         self.csv_name = csv_name
         self.index = index
+        data_obj.registry.register(self.source)
 
-        self.column_checkboxes = self.create_column_checkboxes()
+        self.column_checkboxes = self.create_column_checkboxes(visible)
         self.setAcceptDrops(True)
         self.run_tab()
 
@@ -389,7 +504,7 @@ class ExpandableText(QWidget):
         self.check_button.clicked.connect(self.toggle_expansion)
         
         self.check_button.setStyleSheet('border: none; color: black; font-size: 24px;')
-        if self.dataframe.is_empty():
+        if self.source.is_empty():
             self.check_button.setStyleSheet('border: none; color: red; font-size: 24px;')
 
         # Setup the column selection buttons
@@ -433,27 +548,20 @@ class ExpandableText(QWidget):
             file_name = os.path.basename(file_path)
 
             if file_name.endswith(".csv"):
-                drag_data = pl.scan_csv(file_path)
-                df = drag_data.collect()
-                table_name = os.path.basename(file_path).rstrip('.csv')
-                self.add_dragged_file(df, table_name)
+                lazy = os.path.getsize(file_path) >= file_loader.FileLoader.lazy_threshold
+                for df, table_name in file_loader.read_csv(file_path, lazy, csv_cache.CsvCache()):
+                    self.add_dragged_file(df, table_name)
 
             elif file_path.endswith(".db"):
-                engine = create_engine(f"sqlite:///{file_path}")
-
-                # Reflect database schema to MetaData
-                metadata = MetaData()
-                metadata.reflect(bind=engine)
-
                 # Extract table names
-                self.table_names = list(metadata.tables.keys())
+                self.table_names = db_source.table_names(file_path)
 
                 dialog = QDialog()
                 layout = QVBoxLayout()
 
                 # Process database tables
                 load_db_button = QPushButton("Load Tables")
-                load_db_button.clicked.connect(lambda: self.load_db_table(engine, dialog))
+                load_db_button.clicked.connect(lambda: self.load_db_table(file_path, dialog))
                 
                 for table_name in self.table_names:
                     check_button = QCheckBox(table_name)
@@ -470,15 +578,13 @@ class ExpandableText(QWidget):
         event.acceptProposedAction()
         return
 
-    def load_db_table(self, engine, dialog) -> None:
+    def load_db_table(self, file_path, dialog) -> None:
         """
         Load user selected files
         """
         for table_name in self.table_names:
-            df = pl.read_database(
-                    query=f"SELECT * FROM {table_name}",
-                    connection=engine)
-            self.add_dragged_file(df, table_name)
+            source = db_source.SQLiteSource(file_path, table_name)
+            self.add_dragged_file(source, table_name)
         dialog.close()
         return
 
@@ -512,15 +618,16 @@ class ExpandableText(QWidget):
             existing_vertical_layout.addWidget(new_instance)
         return
 
-    def create_column_checkboxes(self) -> QCheckBox:
+    def create_column_checkboxes(self, visible=None) -> QCheckBox:
         """
-        Create the checkboxes that allows for user to toggle columns in dataframe table
+        Create the checkboxes that allows for user to toggle columns in dataframe table,
+        every column starts out shown unless the visible columns are given
         """
 
         column_checkboxes = {}
-        for column in self.dataframe.columns:
+        for column in self.source.columns:
             checkbox = QCheckBox(column)
-            checkbox.setChecked(True)
+            checkbox.setChecked(visible is None or column in visible)
             checkbox.setVisible(self.is_expanded)
             checkbox.stateChanged.connect(self.setup_data)
             column_checkboxes[column] = checkbox
@@ -542,7 +649,8 @@ class ExpandableText(QWidget):
 
     def load_more_data(self, table, value) -> None:
         """
-        Tells the model to load the next 500 rows
+        Tells the model to load the next 500 rows. Tables over the row limit of Qt move
+        their window of rows along once the scroll bar gets to either end of it
         """
 
         max_value = table.verticalScrollBar().maximum()
@@ -551,9 +659,21 @@ class ExpandableText(QWidget):
         def is_within_range(value1, value2, range_limit=20):
             return abs(value1 - value2) <= range_limit
     
+        model = self.model_dict.get(table)
+        if model is None:
+            return
         if is_within_range(current_value, max_value):
-            if len(self.dataframe) > 500:
-                self.model_dict[table].update_search_text()
+            if model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+            moved = model.shift_window(max_view_rows // 2)
+        elif is_within_range(current_value, table.verticalScrollBar().minimum()):
+            moved = model.shift_window(-(max_view_rows // 2))
+        else:
+            moved = 0
+
+        # Scroll bar values are rows, the rows in view stay where they are
+        if moved:
+            table.verticalScrollBar().setValue(current_value - moved)
         return
 
     def setup_data(self) -> None:
@@ -561,26 +681,44 @@ class ExpandableText(QWidget):
         Setup of the data in their respective tables and tabs
         """
 
-        if self.dataframe.is_empty():
+        if self.source.is_empty():
             print(f"{self.csv_name} is empty! Table unable to load!")
             return
         
         # Generate a new table model for the found data
         if self.csv_name not in self.table_dict:
             model = DataFrameTableModel(
-                self.dataframe,
+                self.source,
                 self.column_checkboxes
             )
 
-            # Apply new model
+            # Fixed row heights keep scrolling constant time no matter how many rows there are,
+            # they are set before the model so the header does not size every row twice
             table = QTableView()
+            table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            table.verticalHeader().setDefaultSectionSize(table.verticalHeader().minimumSectionSize() + 8)
+            table.setVerticalScrollMode(QAbstractItemView.ScrollPerItem)
+
+            # Apply new model
             table.setModel(model)
             table.setSelectionBehavior(QTableView.SelectItems)
             table.verticalHeader().setVisible(False)
 
-            # Make tab for loaded data - save model
+            # Header clicks sort the table, nothing is sorted until one is clicked
+            table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            table.setSortingEnabled(True)
+
+            # Make tab for loaded data - save model, a released table is read back into memory
             self.model_dict[table] = model
             self.table_dict[self.csv_name] = table
+            self.data_obj.registry.view(self.source)
+            model.search_counted.connect(
+                lambda count, finished, table=table: self.data_obj.found_items(count, table, finished)
+            )
+            model.search_progressed.connect(
+                lambda searched, total, table=table: self.data_obj.update_progress(searched, total, table)
+            )
+            model.set_show_matches(self.data_obj.only_matches.isChecked())
             self.tab_widget.addTab(table, self.csv_name)
 
             # Initial split: add the new tab widget to the QSplitter
@@ -592,7 +730,9 @@ class ExpandableText(QWidget):
                     self.table_split.widget(1).addTab(table, self.csv_name)
 
             # Signal Callers
-            table.selectionModel().selectionChanged.connect(self.update_view)
+            table.selectionModel().selectionChanged.connect(
+                lambda selected, deselected, table=table: self.update_view(table)
+            )
             table.verticalScrollBar().valueChanged.connect(
                 lambda value, table=table: self.load_more_data(table, value)
             )
@@ -608,38 +748,13 @@ class ExpandableText(QWidget):
             checkbox.stateChanged.connect(model.update_visible_columns)
         return
 
-    def update_view(self) -> pl.DataFrame:
+    def update_view(self, table) -> None:
         """
-        Get the data for the user to select and save to CSV
+        Remember the table the user last selected in, the selected cells are only read when saved
         """
-
-        selected_data = {}
-
-        # Load th selected data that the user selects
-        for table_widget in self.table_dict.values():
-            model = self.model_dict[table_widget]
-            for index in table_widget.selectionModel().selectedIndexes():
-                row = index.row()
-                col = index.column()
-                header = model.headerData(col, Qt.Horizontal)
-                selected_data[header] = selected_data.get(header, []) + [model._dataframe[row, col]]
-        self.saved_data = pl.DataFrame(selected_data)
+        self.data_obj.selected_table = table
         return
 
-    def save_csv(self) -> None:
-        """
-        Save CSV based on what user selected in table
-        """
-
-        if self.saved_data is not None:
-            if not self.saved_data.is_empty():
-                file_dialog = QFileDialog()
-                file_dialog.setAcceptMode(QFileDialog.AcceptSave)
-                file_path, _ = file_dialog.getSaveFileName(self, "Save Selected Data", "", "CSV Files (*.csv)")
-                self.saved_data.write_csv(file_path)
-                print("Selected Data saved to:", file_path)
-        return 
-
 
 class DataFrameViewer(QWidget):
     """
@@ -647,13 +762,22 @@ class DataFrameViewer(QWidget):
     """
 
     _bool = False
-    model_dict = {}
-    table_dict = {}
-    label_dict = defaultdict(int)
+    live = False
+    # Pause in typing before a live search runs
+    debounce_ms = 250
+    search_total = 0
+    selected_table = None
 
-    def __init__(self, data) -> None:
+    def __init__(self, data, memory_budget=None) -> None:
         super().__init__()
 
+        # Every window keeps its own tables, closing it lets them all go
+        self.registry = table_registry.TableRegistry(memory_budget)
+        self.model_dict = self.registry.models
+        self.table_dict = self.registry.tables
+        self.label_dict = {}
+        self.pending_searches = set()
+
         self.data = data
         self.init_ui()
 
@@ -665,7 +789,7 @@ class DataFrameViewer(QWidget):
     
         # Setup Layouts
         main_layout = QVBoxLayout()
-        labels_layout = QVBoxLayout()
+        self.labels_layout = QVBoxLayout()
         center_layout = QHBoxLayout()
 
         self.tab_widget = QTabWidget()
@@ -676,9 +800,16 @@ class DataFrameViewer(QWidget):
         self.table_split = QSplitter(Qt.Horizontal)
 
         # Search bar handler
-        search_bar = QLineEdit()
-        search_bar.setPlaceholderText("Search...")
-        search_bar.returnPressed.connect(self.search_tables)
+        self.search_bar = QLineEdit()
+        self.search_bar.setPlaceholderText("Search...")
+        self.search_bar.returnPressed.connect(self.search_tables)
+        self.search_bar.textChanged.connect(self.queue_search)
+
+        # Typing only searches once the user pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.debounce_ms)
+        self.search_timer.timeout.connect(self.search_tables)
 
         # Label & Checkbox initalizers
         label_layout = QVBoxLayout()
@@ -687,25 +818,59 @@ class DataFrameViewer(QWidget):
         self.index_label = QLabel("")
         self.split_search = QCheckBox("Search Splitter")
         self.all_table = QCheckBox("Search All Tables")
+        self.live_search = QCheckBox("Search As You Type")
+        self.free_text = QCheckBox("Free Text")
+        self.regex = QCheckBox("Regex")
+        self.only_matches = QCheckBox("Show Only Matches")
+        self.progressive = QCheckBox("Progressive Search")
+
+        # Progressive searches can stop early for find first navigation
+        self.stop_after = QSpinBox()
+        self.stop_after.setRange(0, 10_000_000)
+        self.stop_after.setPrefix("Stop after ")
+        self.stop_after.setSuffix(" matches")
+        self.stop_after.setSpecialValueText("Find all matches")
+        self.search_progress = QProgressBar()
+        self.search_progress.hide()
+        self.export_progress = QProgressBar()
+        self.export_progress.setFormat("Saving %p%")
+        self.export_progress.hide()
+        self.export_threads = set()
+        self.diff_threads = set()
+        self.only_matches.stateChanged.connect(self.show_only_matches)
 
         # Buttons
         results_button = QPushButton("Load Search Results")
         results_button.clicked.connect(self.load_search_results)
+        save_button = QPushButton("Save Selected")
+        save_button.clicked.connect(self.save_csv)
+        self.compare_button = QPushButton("Compare Tabs")
+        self.compare_button.clicked.connect(self.compare_tabs)
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(results_button)
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(self.compare_button)
+        button_layout.addWidget(self.export_progress)
 
         # Run the data through the expanded text list
         for csv_name, df in self.data.items():
-            df = df.rename({col: col.lower() for col in df.columns})
-            text_widget = ExpandableText(self, self.tab_widget, df, csv_name, None)
-            labels_layout.addWidget(text_widget)
+            self.add_table(csv_name, df)
 
         # Configure layouts
         label_layout.addWidget(self.index_label)
         checkbox_layout.addLayout(label_layout)
         checkbox_layout.addWidget(self.split_search)
         checkbox_layout.addWidget(self.all_table)
+        checkbox_layout.addWidget(self.live_search)
+        checkbox_layout.addWidget(self.free_text)
+        checkbox_layout.addWidget(self.regex)
+        checkbox_layout.addWidget(self.only_matches)
+        checkbox_layout.addWidget(self.progressive)
+        checkbox_layout.addWidget(self.stop_after)
+        checkbox_layout.addWidget(self.search_progress)
         checkbox_layout.addStretch()
 
-        scroll_widget.setLayout(labels_layout)
+        scroll_widget.setLayout(self.labels_layout)
         scroll_area.setWidget(scroll_widget)
         scroll_area.setWidgetResizable(True)
         scroll_area.setFixedWidth(500)
@@ -718,14 +883,29 @@ class DataFrameViewer(QWidget):
 
         # Main Layout
         center_layout.addWidget(main_splitter)
-        main_layout.addWidget(results_button)
-        main_layout.addWidget(search_bar)
+        main_layout.addLayout(button_layout)
+        main_layout.addWidget(self.search_bar)
         main_layout.addLayout(checkbox_layout)
         main_layout.addLayout(center_layout)
         self.setLayout(main_layout)
         self.tab_configure()
         return
 
+    def add_table(self, csv_name, df) -> None:
+        """
+        Add a loaded dataframe to the expanded text list, tables can arrive after the window is shown.
+        Lazy tables are kept lazy and only the shown rows get collected
+        """
+        source = table_source.to_source(df)
+        source = source.rename({col: col.lower() for col in source.columns})
+        source.prepare_search()
+
+        # The loaded dataframe would keep a spilled table in memory, only the source is kept
+        self.data[csv_name] = source
+        text_widget = ExpandableText(self, self.tab_widget, source, csv_name, None)
+        self.labels_layout.addWidget(text_widget)
+        return
+
     def tab_configure(self) -> None:
         """
         Configure the tab functionaility
@@ -734,29 +914,23 @@ class DataFrameViewer(QWidget):
         self.tab_widget.setMovable(True)
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.currentChanged.connect(self.update_label)
+        self.tab_widget.currentChanged.connect(
+            lambda index: self.view_table(self.tab_widget.widget(index))
+        )
         self.tab_widget.tabBarDoubleClicked.connect(self.load_splitter)
         self.tab_widget.tabCloseRequested.connect(self.maintabCloseRequested)
         return
     
-    def get_current_tab_dataframe(self) -> pl.DataFrame:
-        """
-        Get the current dataframe of the modified table, hidden columns and all
-        """
-
-        current_index = self.tab_widget.currentIndex()
-        if current_index != -1:
-            current_tab = self.tab_widget.widget(current_index)
-            if isinstance(current_tab, QTableView):
-                model = current_tab.model()
-            return model.current_dataframe()
-        return pl.DataFrame()
-
-
     def load_splitter(self, index) -> None:
         """
-        This allows for the user to double click on the tab and be able to compare a tab on the side
+        This allows for the user to double click on the tab and be able to compare a tab on the side.
+        The side view shares the table, its caches and indexes, only the view state is its own
         """
 
+        table = self.tab_widget.widget(index)
+        if not isinstance(table, QTableView):
+            return
+
         self._bool = True
         new_name = f"{self.tab_widget.tabText(index)} - {index}"
 
@@ -764,70 +938,156 @@ class DataFrameViewer(QWidget):
             return
         
         self.new_tab_widget = QTabWidget()
-        dataframe = self.get_current_tab_dataframe()
+        model = table.model()
 
         self.new_tab_widget.setTabsClosable(True)
         self.new_tab_widget.tabCloseRequested.connect(self.tabCloseRequested)
+        self.new_tab_widget.currentChanged.connect(
+            lambda index, tab=self.new_tab_widget: self.view_table(tab.widget(index))
+        )
     
-        # Ensure dataframe is not empty before creating splitter item
-        if new_name not in self.table_dict:
-            self.table_dict[new_name] = ExpandableText(self, self.new_tab_widget,
-                                                  dataframe, new_name, index)
-        print(f"{self.table_dict = }")
+        # Same source object as the tab, starting from the columns the tab shows
+        self.table_dict[new_name] = ExpandableText(self, self.new_tab_widget, model.source,
+                                                   new_name, index, model.visible_columns)
         return
 
     def tabCloseRequested(self, index) -> None:
         """
-        Make all tabs after the first one closable
+        Close a tab of the split view it was clicked in, the split view goes once its last tab is closed
         """
 
-        del_tab = self.tab_widget.tabText(index)
-        if self.table_dict.get(del_tab):
-            del self.table_dict[del_tab]
-            self.table_split.widget(1).setParent(None)
+        tab = self.sender()
+        del_tab = tab.tabText(index)
+        table = tab.widget(index)
+        self.table_dict.pop(del_tab, None)
+        if isinstance(table, QTableView):
+            self.release_table(table)
+        tab.removeTab(index)
+
+        if not tab.count():
+            tab.setParent(None)
+            tab.deleteLater()
+            splits = self.split_tabs()
+            self._bool = bool(splits)
+            self.new_tab_widget = splits[0] if splits else None
         return
 
+    def split_tabs(self) -> list:
+        """
+        Tab widgets of the split views, every double clicked tab opens its own next to the main tabs
+        """
+        widgets = [self.table_split.widget(index) for index in range(self.table_split.count())]
+        return [widget for widget in widgets if isinstance(widget, QTabWidget) and widget is not self.tab_widget]
+
     def maintabCloseRequested(self, index) -> None:
         """
         Main tab widget closable and search total label from label dict
         """
 
         del_tab = self.tab_widget.tabText(index)
+        table = self.tab_widget.widget(index)
         if self.table_dict.get(del_tab):
             del self.table_dict[del_tab]
-            del self.label_dict[index]
+        if isinstance(table, QTableView):
+            self.release_table(table)
         self.tab_widget.removeTab(index)
+        self.update_label(self.tab_widget.currentIndex())
+        return
+
+    def view_table(self, table) -> None:
+        """
+        Table brought into focus, its data is read back into memory if it was spilled
+        """
+        if isinstance(table, QTableView) and table in self.model_dict:
+            self.registry.view(self.model_dict[table].source)
+        return
+
+    def release_table(self, table) -> None:
+        """
+        Let go of a closed table: its searches, counts and model. Once no view shows the table its
+        caches are dropped and it is spilled, it can still be opened again from its label
+        """
+        model = self.model_dict.pop(table, table.model())
+        search_engine.SearchExecutor.shared().cancel(model)
+        for thread in model.sort_threads:
+            thread.wait()
+        self.label_dict.pop(model, None)
+        self.pending_searches.discard(model)
+        if self.selected_table is table:
+            self.selected_table = None
+
+        # Split views share the source of their tab, it stays in use while any view shows it
+        if all(other.source is not model.source for other in self.model_dict.values()):
+            self.registry.release(model.source)
+        table.deleteLater()
+        return
+
+    def closeEvent(self, event) -> None:
+        """
+        Release every table of the window when it closes
+        """
+        self.search_timer.stop()
+        for thread in self.diff_threads:
+            thread.cancel()
+        for thread in self.export_threads | self.diff_threads:
+            thread.wait()
+
+        # Tables are forgotten first so closing them does not spill them
+        tables = list(self.model_dict)
+        self.registry.close()
+        for table in tables:
+            self.release_table(table)
+
+        self.tab_widget.clear()
+        for index in reversed(range(self.labels_layout.count())):
+            widget = self.labels_layout.itemAt(index).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self.label_dict.clear()
+        self.pending_searches.clear()
+        self.data.clear()
+        super().closeEvent(event)
         return
 
     def search_tables(self) -> None:
         """
-        User can type a string here and search all the loaded tables to highlight them
+        User can type a string here and search all the loaded tables to highlight them.
+        Tables are searched side by side on the search workers and their counts come in as each finishes
         """
 
-        self.search_text = self.sender().text()
+        self.live = self.sender() is self.search_timer
+        self.search_timer.stop()
+        self.search_text = self.search_bar.text()
 
-        def run_search(tab) -> None:
+        def run_search(tab) -> list:
             """
-            Check if user is search all existing tables or not
+            Check if user is search all existing tables or not, the focused table goes first
             """
 
-            if self.all_table.isChecked():
-                for idx in range(len(tab)):
-                    index_table = tab.widget(idx)
-                    self.table_model_set(index_table)
-                return
-            
             current_tab = tab.currentIndex()
-            index_table = tab.widget(current_tab)
-            return self.table_model_set(index_table)
+            if not self.all_table.isChecked():
+                return [tab.widget(current_tab)]
+            others = [tab.widget(idx) for idx in range(tab.count()) if idx != current_tab]
+            return [tab.widget(current_tab)] + others
 
         # Run through all the tabs if they exist
-        if self.tab_widget:
-           run_search(self.tab_widget)
+        tables = run_search(self.tab_widget) if self.tab_widget else []
    
         # Check if user is searching all split tables
-        if self._bool and self.split_search.isChecked():
-            run_search(self.new_tab_widget)
+        if self.split_search.isChecked():
+            for tab in self.split_tabs():
+                tables += run_search(tab)
+
+        # Counts of the searched tables start over, the others keep their last count
+        tables = [table for table in tables if isinstance(table, QTableView)]
+        for table in tables:
+            self.label_dict.pop(table.model(), None)
+        self.pending_searches = {table.model() for table in tables}
+        self.search_total = len(self.pending_searches)
+        self.update_label(self.tab_widget.currentIndex())
+
+        for table in tables:
+            self.table_model_set(table)
         return
 
     def table_model_set(self, index_table) -> QAbstractTableModel:
@@ -838,18 +1098,41 @@ class DataFrameViewer(QWidget):
         if isinstance(index_table, QTableView):
             model = index_table.model()
             model.text = self.search_text
-            search = model.update_search_text()
+            model.search_mode = self.search_mode()
+            model.progressive = self.progressive.isChecked()
+            model.match_limit = self.stop_after.value()
 
-            # Populate the found items label and label dict
-            self.found_items(search, index_table)
+            # Found items label and label dict are filled in when the search finishes
+            model.update_search_text(self.live)
         return model
     
-    def found_items(self, search, index_table) -> None: 
+    def queue_search(self) -> None:
         """
-        Process the number of found items in a table
+        Restart the typing pause timer, only the text typed last gets searched
         """
-        index = self.tab_widget.indexOf(index_table)
-        self.label_dict[index] = search
+        if self.live_search.isChecked():
+            self.search_timer.start()
+        return
+
+    def search_mode(self) -> str:
+        """
+        How the search text is used, regex implies a free text search
+        """
+        if self.regex.isChecked():
+            return 'regex'
+        return 'text' if self.free_text.isChecked() else 'query'
+
+    def found_items(self, search, index_table, finished=True) -> None: 
+        """
+        Process the number of found items in a table, the total updates as each table finishes
+        and as progressive searches find more
+        """
+        model = index_table.model()
+        self.label_dict[model] = search
+        if finished:
+            self.pending_searches.discard(model)
+            if index_table is self.tab_widget.currentWidget():
+                self.search_progress.hide()
 
         # Update dictionary based on index
         curr_index = self.tab_widget.currentIndex()
@@ -861,15 +1144,175 @@ class DataFrameViewer(QWidget):
         Display the proper found items for individual tables focused
         """
 
-        if not self.label_dict:
+        table = self.tab_widget.widget(index)
+        model = table.model() if isinstance(table, QTableView) else None
+        if not self.label_dict and not self.pending_searches:
             self.index_label.setText("No items found.")
             return
 
-        label_val = self.label_dict[index]
         total_found = sum(self.label_dict.values())
-        self.index_label.setText(f"{label_val} of {total_found} total found in table.")
+        if model in self.pending_searches:
+            text = f"Searching... {total_found} total found so far."
+        else:
+            text = f"{self.label_dict.get(model, 0)} of {total_found} total found in table."
+
+        # Tables still being searched
+        if self.pending_searches:
+            text += f" {len(self.pending_searches)} of {self.search_total} tables left to search."
+
+        # Say how much of the table is left in view
+        if self.only_matches.isChecked() and model is not None:
+            text += f" Showing {model.total_rows():,} of {len(model.source):,} rows."
+        self.index_label.setText(text)
+        return
+
+    def update_progress(self, searched, total, index_table) -> None:
+        """
+        Show how far the progressive search of the focused table got
+        """
+        if index_table is not self.tab_widget.currentWidget():
+            return
+        self.search_progress.setRange(0, max(total, 1))
+        self.search_progress.setValue(searched)
+        self.search_progress.setVisible(searched < total)
+        return
+
+    def show_only_matches(self) -> None:
+        """
+        Toggle every table between its matched rows and the whole table
+        """
+        for model in self.model_dict.values():
+            model.set_show_matches(self.only_matches.isChecked())
+        self.update_label(self.tab_widget.currentIndex())
         return
     
+    def save_csv(self) -> None:
+        """
+        Save what the user selected in the last selected table to CSV or Parquet.
+        The selection is read as row and column ranges and written in the background
+        """
+
+        table = self.selected_table
+        if table is None or table not in self.model_dict:
+            return
+        model = self.model_dict[table]
+        rows, columns = table_export.selected_ranges(table.selectionModel().selection())
+        if not len(rows):
+            return
+
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Selected Data", "", "CSV Files (*.csv);;Parquet Files (*.parquet)"
+        )
+        if not file_path:
+            return
+
+        # Keep the thread until it is done, dropping a running thread takes the app down with it
+        thread = table_export.ExportThread(
+            model.source, model.source_rows(rows), [model.headerData(col, Qt.Horizontal) for col in columns], file_path
+        )
+        thread.export_progress.connect(self.update_export)
+        thread.export_finished.connect(lambda path: print("Selected Data saved to:", path))
+        thread.export_failed.connect(lambda error: print(f"Unable to save selected data: {error}"))
+        thread.finished.connect(lambda thread=thread: self.export_threads.discard(thread))
+        thread.finished.connect(self.export_progress.hide)
+        self.export_threads.add(thread)
+        self.export_progress.setValue(0)
+        self.export_progress.show()
+        thread.start()
+        return
+
+    def update_export(self, written, total) -> None:
+        """
+        Show how many of the selected rows are saved
+        """
+        self.export_progress.setRange(0, max(total, 1))
+        self.export_progress.setValue(written)
+        return
+
+    def compare_tabs(self) -> None:
+        """
+        Compare the focused table with another table on a key column, the split view's tables are offered first.
+        Rows only in one of the tables and the changed cells are highlighted on both sides.
+        While a comparison runs the button cancels it instead
+        """
+
+        if self.diff_threads:
+            for thread in self.diff_threads:
+                thread.cancel()
+            return
+
+        left = self.tab_widget.currentWidget()
+        if left not in self.model_dict:
+            return
+
+        # Tables the focused table can be compared with
+        others = {}
+        for tab in self.split_tabs() + [self.tab_widget]:
+            for index in range(tab.count()):
+                table = tab.widget(index)
+                if table is not left and table in self.model_dict:
+                    others.setdefault(tab.tabText(index), table)
+        if not others:
+            print("Open another table to compare with.")
+            return
+
+        left_name = self.tab_widget.tabText(self.tab_widget.currentIndex())
+        name, ok = QInputDialog.getItem(self, "Compare Tabs", f"Compare {left_name} with:", list(others), 0, False)
+        if not ok:
+            return
+        right = others[name]
+        left_source, right_source = self.model_dict[left].source, self.model_dict[right].source
+
+        keys = [column for column in left_source.columns
+                if column in right_source.schema and column not in table_diff.ignored_columns]
+        if not keys:
+            print(f"{left_name} and {name} have no column in common to match rows on.")
+            return
+        key, ok = QInputDialog.getItem(self, "Compare Tabs", "Match rows on:", keys, 0, False)
+        if not ok:
+            return
+
+        # Keep the thread until it is done, dropping a running thread takes the app down with it
+        thread = table_diff.DiffThread(left_source, right_source, key)
+        thread.diff_finished.connect(
+            lambda result, left_mask, right_mask, tables=(left, right):
+                self.show_diff(result, tables, (left_mask, right_mask))
+        )
+        thread.diff_failed.connect(self.diff_failed)
+        thread.finished.connect(lambda thread=thread: self.diff_done(thread))
+        self.diff_threads.add(thread)
+        self.index_label.setText(f"Comparing {left_name} with {name}...")
+        self.compare_button.setText("Cancel Compare")
+        thread.start()
+        return
+
+    def diff_failed(self, error) -> None:
+        """
+        Let the user know the comparison did not finish
+        """
+        print(f"Unable to compare tables: {error}")
+        self.index_label.setText(f"Unable to compare tables: {error}")
+        return
+
+    def diff_done(self, thread) -> None:
+        """
+        Forget a finished comparison, the button compares again once none are running
+        """
+        self.diff_threads.discard(thread)
+        if not self.diff_threads:
+            self.compare_button.setText("Compare Tabs")
+        return
+
+    def show_diff(self, result, tables, masks) -> None:
+        """
+        Highlight the differences on both compared tables, Show Only Matches then shows the differing rows
+        """
+        for side, table in enumerate(tables):
+            if table in self.model_dict:
+                self.model_dict[table].show_highlights(result.rows(side), masks[side])
+        self.index_label.setText(result.summary())
+        return
+
     def load_search_results(self) -> None:
         """
         Load the search results into the results window
@@ -883,14 +1326,15 @@ class DataFrameViewer(QWidget):
         # Iterate through each tab and their table
         for index in range(self.tab_widget.count()):
             tab_name = self.tab_widget.tabText(index)
-            model = self.tab_widget.widget(index).model()
-            data = model.get_result()
+            table = self.tab_widget.widget(index)
+            if not isinstance(table, QTableView):
+                continue
 
             # Make table model and apply
-            model = MyTableModel(data)
+            model = table.model().result_model()
             self.results_table = QTableView()
             self.results_table.setModel(model)
-            self.results_tab_config(model)
+            self.results_tab_config()
             
             # Defined model and data
             if self.tab_widget.tabText(index) not in self.tab_dict:
@@ -904,15 +1348,15 @@ class DataFrameViewer(QWidget):
         self.central_widget.show()
         return
     
-    def results_tab_config(self, model) -> None:
+    def results_tab_config(self) -> None:
         """
         Configure signals and style of tab widget
         """
 
         self.results_table.verticalHeader().setVisible(False)
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.results_table.setSelectionBehavior(QTableView.SelectRows)
         self.results_table.selectionModel().selectionChanged.connect(self.on_clicked)
-        self.results_table.verticalScrollBar().valueChanged.connect(lambda: self.load_next_batch(model))
         return
 
     def on_clicked(self) -> None:
@@ -927,32 +1371,27 @@ class DataFrameViewer(QWidget):
         # Focus on table
         self.tab_widget.setCurrentIndex(tab_item[0])
         current_table = self.tab_widget.widget(tab_item[0])
-        results_table = self.result_tab.widget(tab_item[0])
 
         # Go to selected table index
         selected_indexes = tab_item[1].selectionModel().selectedIndexes()
         if not selected_indexes:
             return
-        
-        index = results_table.model().data(selected_indexes[0], Qt.DisplayRole)
 
-        # Scroll through the batch size value to get to the value of interest
-        val = current_table.verticalScrollBar()
-        for _ in range(int(index)):
-            val.setValue(val.maximum())
-        current_table.selectRow(int(index)-1)
+        # Result rows know the table row they came from
+        result_model = tab_item[1].model()
+        self.scroll_to_row(current_table, result_model.source_row(selected_indexes[0].row()))
         return
 
-    def load_next_batch(self, model) -> None:
+    def scroll_to_row(self, table, row) -> None:
         """
-        Load the next batch of data for the results window to select
+        Jump straight to a row of the table and select it, wherever sorting has put it
         """
-
-        max_value = self.results_table.verticalScrollBar().maximum()
-        current_value = self.results_table.verticalScrollBar().value()
-
-        def is_within_range(value1, value2, range_limit=20):
-            return abs(value1 - value2) <= range_limit
-    
-        if is_within_range(current_value, max_value):
+        model = table.model()
+        position = model.view_position(row)
+        if position < 0:
             return
+        row = model.window_row(position)
+        model.fetch_to(row)
+        table.scrollTo(model.index(row, 0), QAbstractItemView.PositionAtCenter)
+        table.selectRow(row)
+        return
@@ -0,0 +1,77 @@
+import polars as pl
+
+# Integer types and their bits from the smallest up, a column is stored in the first one its values fit in
+int_types = {pl.Int8: 8, pl.Int16: 16, pl.Int32: 32, pl.Int64: 64}
+
+# Rows measured to estimate how much memory the typed columns save
+sample_rows = 100_000
+
+def statistics(lazyframe, schema) -> dict:
+    """
+    Work out in one pass over the table what each column can be stored as: estimated distinct counts
+    and date parsing for text, value ranges for integers and float32 round trips for floats.
+    Distinct counts are estimated so text columns are not held in memory to count them
+    """
+    exprs = [pl.len().alias('__rows')]
+    for name, dtype in schema.items():
+        column = pl.col(name)
+        if dtype == pl.String:
+            exprs += [column.approx_n_unique().alias(f"{name}__unique"),
+                      (column.is_not_null().any() & (column.str.to_date(strict=False).null_count() == column.null_count()))
+                      .alias(f"{name}__date")]
+        elif dtype in int_types:
+            exprs += [column.min().alias(f"{name}__min"), column.max().alias(f"{name}__max")]
+        elif dtype == pl.Float64:
+            exprs += [(column.cast(pl.Float32).cast(pl.Float64) == column).or_(column.is_nan()).fill_null(True).all()
+                      .alias(f"{name}__float32")]
+    return lazyframe.select(exprs).collect().row(0, named=True)
+
+def casts(schema, stats) -> list:
+    """
+    Expressions that store each column in the smallest type holding all of its values.
+    Text parsing as dates becomes Date, text repeating a lot becomes Categorical
+    """
+    rows = stats['__rows']
+    exprs = []
+    for name, dtype in schema.items():
+        column = pl.col(name)
+        if dtype == pl.String:
+            if stats[f"{name}__date"]:
+                exprs.append(column.str.to_date())
+            elif stats[f"{name}__unique"] * 4 <= rows:
+                exprs.append(column.cast(pl.Categorical))
+        elif dtype in int_types and stats[f"{name}__min"] is not None:
+            low, high = stats[f"{name}__min"], stats[f"{name}__max"]
+            fits = next(int_type for int_type, bits in int_types.items()
+                        if -2 ** (bits - 1) <= low and high < 2 ** (bits - 1))
+            if fits != dtype:
+                exprs.append(column.cast(fits))
+        elif dtype == pl.Float64 and stats[f"{name}__float32"]:
+            exprs.append(column.cast(pl.Float32))
+    return exprs
+
+def optimize(lazyframe) -> tuple:
+    """
+    Type the columns of a scanned table. Hands back the typed LazyFrame and the estimated
+    size of the table in bytes before and after typing it
+    """
+    schema = lazyframe.collect_schema()
+    stats = statistics(lazyframe, schema)
+    exprs = casts(schema, stats)
+    if not exprs:
+        return lazyframe, 0, 0
+
+    typed = lazyframe.with_columns(exprs)
+    sample = lazyframe.head(sample_rows).collect()
+    scale = stats['__rows'] / max(sample.height, 1)
+    before = int(sample.estimated_size() * scale)
+    after = int(sample.lazy().with_columns(exprs).collect().estimated_size() * scale)
+    return typed, before, after
+
+def report(table_name, before, after) -> str:
+    """
+    Describe the memory typing saved on a table
+    """
+    saved = before - after
+    percent = saved / before * 100 if before else 0
+    return f"{table_name}: typed columns saved about {saved / 1024 ** 2:,.1f} MB ({percent:.0f}%)"
@@ -0,0 +1,60 @@
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.block_cache as block_cache
+import Local_DB_Viwer.table_source as table_source
+
+rows = 3_000
+table = pl.DataFrame({
+    'id': np.arange(rows),
+    'name': [None if i % 11 == 0 else f"n{i}" for i in range(rows)],
+    'flag': [i % 2 == 0 for i in range(rows)],
+})
+
+def sources() -> list:
+    return [table_source.FrameSource(table), table_source.LazySource(table.lazy())]
+
+def test_format_frame() -> None:
+    """
+    Cells are formatted as text once per column, nulls read as None
+    """
+    columns = block_cache.format_frame(table.head(3))
+    assert columns == [['0', '1', '2'], ['None', 'n1', 'n2'], ['True', 'False', 'True']]
+
+@pytest.mark.parametrize('source', sources())
+def test_table_order(source) -> None:
+    """
+    Without a row order the cells are the rows of the table
+    """
+    cache = block_cache.BlockCache(source, ['name', 'id'])
+    for row in (0, 255, 256, 1_000, rows - 1):
+        assert cache.text(row, 1) == str(row)
+        assert cache.text(row, 0) == ('None' if row % 11 == 0 else f"n{row}")
+
+@pytest.mark.parametrize('source', sources())
+def test_row_order(source, monkeypatch) -> None:
+    """
+    A row order shows the rows in that order, sources with a gather window read it a window at a time
+    """
+    if source.gather_window:
+        monkeypatch.setattr(source, 'gather_window', 4 * block_cache.BlockCache.block_rows)
+    order = np.random.default_rng(1).permutation(rows)
+    cache = block_cache.BlockCache(source, ['id'])
+    cache.set_rows(order)
+    shown = [int(cache.text(row, 0)) for row in range(rows)]
+    assert np.array_equal(shown, order)
+
+def test_least_recent_blocks_go() -> None:
+    """
+    Only the most recently viewed blocks are kept
+    """
+    cache = block_cache.BlockCache(table_source.FrameSource(table), ['id'])
+    cache.max_blocks = 2
+    for row in (0, 300, 600, 300):
+        cache.text(row, 0)
+    assert list(cache._blocks) == [2, 1]
+
+    cache.set_columns(['name'])
+    assert not cache._blocks and cache.text(1, 0) == 'n1'
@@ -0,0 +1,96 @@
+import datetime
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.column_index as column_index
+import Local_DB_Viwer.search_engine as search_engine
+import Local_DB_Viwer.table_source as table_source
+
+rows = 200_000
+rng = np.random.default_rng(3)
+table = pl.DataFrame({
+    'city': pl.Series(['Oslo', 'Lima', 'Pune', 'Kyiv', None]).gather(rng.integers(0, 5, rows)),
+    'amount': np.arange(rows),
+    'noise': rng.normal(size=rows),
+    'day': pl.date_range(datetime.date(2000, 1, 1), datetime.date(2000, 1, 1) + datetime.timedelta(days=rows - 1),
+                         eager=True),
+}).with_columns(pl.when(pl.col('amount') % 1000 == 7).then(float('nan')).otherwise(pl.col('noise')).alias('noise'))
+
+def test_hash_index_lookup() -> None:
+    """
+    Equality and `in` lookups ignore case and give the rows in table order
+    """
+    index = column_index.HashIndex.build(table['city'])
+    expected = np.flatnonzero((table['city'] == 'Lima').fill_null(False).to_numpy())
+    assert np.array_equal(index.candidates('=', 'lima'), expected)
+    both = np.flatnonzero(table['city'].is_in(['Lima', 'Kyiv']).fill_null(False).to_numpy())
+    assert np.array_equal(index.candidates('in', ['lima', 'kyiv']), both)
+    assert len(index.candidates('=', 'paris')) == 0
+    assert index.candidates('>', 'lima') is None
+
+@pytest.mark.parametrize('op, value', [('=', 5_000), ('>', 190_000), ('<=', 100), ('between', (1_000, 1_200)),
+                                       ('in', [3, 150_000])])
+def test_zone_map_keeps_every_match(op, value) -> None:
+    """
+    Blocks a zone map keeps hold every matching row and skip most of the others
+    """
+    index = column_index.ZoneMap.build(table['amount'])
+    candidates = index.candidates(op, value)
+    expr = {'=': pl.col('amount') == value, '>': pl.col('amount') > value, '<=': pl.col('amount') <= value,
+            'between': pl.col('amount').is_between(*value) if op == 'between' else None,
+            'in': pl.col('amount').is_in(value) if op == 'in' else None}[op]
+    matched = table.with_row_index('__row').filter(expr)['__row'].to_numpy()
+    assert np.isin(matched, candidates).all()
+    assert len(candidates) < rows
+
+def test_zone_map_nan_blocks() -> None:
+    """
+    Blocks holding NaN stay candidates for conditions above every number
+    """
+    index = column_index.ZoneMap.build(table['noise'])
+    candidates = index.candidates('>', 100.0)
+    assert candidates is None or np.isin(np.flatnonzero(table['noise'].is_nan().to_numpy()), candidates).all()
+
+@pytest.mark.parametrize('text', [
+    "city = lima", "city in (oslo, kyiv) and amount < 50000", "amount between 1000 and 1500",
+    "amount = 7 or amount = 199999", "day >= 2500-01-01", "noise > 1.5 and amount < 3000",
+    "city = lima and amount > 150000", "not city = lima and amount < 100",
+])
+def test_planned_search_matches_scan(text) -> None:
+    """
+    Searches narrowed by the column indexes find the same rows and hits as scanning the whole table
+    """
+    scanned = search_engine.evaluate(table_source.FrameSource(table), text)
+
+    source = table_source.FrameSource(table)
+    for column in table.columns:
+        source.column_index(column)
+        source.build_column_index(column)
+    planned = search_engine.evaluate(source, text)
+
+    assert np.array_equal(planned.rows, scanned.rows)
+    assert planned.hits.keys() == scanned.hits.keys()
+    for column, hits in scanned.hits.items():
+        assert np.array_equal(planned.hits[column], hits)
+
+def test_intersect_and_union() -> None:
+    found = [np.array([1, 3, 5, 7]), np.array([3, 4, 5]), np.array([0, 3, 5, 9])]
+    assert np.array_equal(column_index.intersect(found, 10), [3, 5])
+    assert np.array_equal(column_index.union(found, 10), [0, 1, 3, 4, 5, 7, 9])
+
+@pytest.mark.parametrize('dtype', [pl.Int8, pl.UInt32, pl.Float32])
+@pytest.mark.parametrize('text', ["a > 5000", "a > -5", "a < -300", "a in (1, 300)", "a between 1 and 1000",
+                                  "a = 99999999999999999999"])
+def test_values_outside_column_type(dtype, text) -> None:
+    """
+    Values the column type can not hold still search the same as a scan once the zone map is built
+    """
+    values = pl.Series('a', np.arange(100_000) % 100, dtype=dtype)
+    scanned = search_engine.evaluate(table_source.FrameSource(values.to_frame()), text)
+
+    source = table_source.FrameSource(values.to_frame())
+    source.column_index('a')
+    source.build_column_index('a')
+    assert np.array_equal(search_engine.evaluate(source, text).rows, scanned.rows)
@@ -0,0 +1,79 @@
+import os
+import time
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.csv_cache as csv_cache
+
+@pytest.fixture
+def csv_files(tmp_path) -> list:
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"table{idx}.csv"
+        pl.DataFrame({'a': list(range(1_000)), 'b': [f"v{idx}"] * 1_000}).write_csv(path)
+        paths.append(str(path))
+    return paths
+
+def test_store_and_load(tmp_path, csv_files) -> None:
+    """
+    A stored file loads back from the cache, other load options or a changed file miss it
+    """
+    cache = csv_cache.CsvCache(str(tmp_path / 'cache'))
+    assert cache.load(csv_files[0], {'typed': False}) is None
+
+    stored = cache.store(csv_files[0], pl.scan_csv(csv_files[0]), {'typed': False})
+    assert stored.collect().equals(pl.read_csv(csv_files[0]))
+    assert cache.load(csv_files[0], {'typed': False}).collect().equals(pl.read_csv(csv_files[0]))
+    assert cache.load(csv_files[0], {'typed': True}) is None
+
+    pl.DataFrame({'a': [1]}).write_csv(csv_files[0])
+    assert cache.load(csv_files[0], {'typed': False}) is None
+
+def test_evict_least_recently_used(tmp_path, csv_files) -> None:
+    """
+    Once the cache is over its budget the least recently used files go, the newest stays
+    """
+    cache = csv_cache.CsvCache(str(tmp_path / 'cache'), max_bytes=0)
+    first = cache.store(csv_files[0], pl.read_csv(csv_files[0]), {})
+    assert first is not None
+    path = cache.path(csv_files[0], {})
+    assert os.path.exists(path)
+
+    cache.store(csv_files[1], pl.read_csv(csv_files[1]), {})
+    assert not os.path.exists(path)
+    assert os.path.exists(cache.path(csv_files[1], {}))
+
+def test_evict_order(tmp_path, csv_files) -> None:
+    """
+    Files are evicted oldest first until the rest fit
+    """
+    cache = csv_cache.CsvCache(str(tmp_path / 'cache'))
+    for idx, file_path in enumerate(csv_files):
+        cache.store(file_path, pl.read_csv(file_path), {})
+        path = cache.path(file_path, {})
+        os.utime(path, (time.time() - 100 + idx, time.time() - 100 + idx))
+    size = os.path.getsize(cache.path(csv_files[0], {}))
+
+    cache.max_bytes = size * 2
+    cache.evict()
+    assert [os.path.exists(cache.path(file_path, {})) for file_path in csv_files] == [False, True, True]
+
+def test_held_files_stay(tmp_path, csv_files) -> None:
+    """
+    Files an open table scans are not evicted or cleared until released
+    """
+    cache = csv_cache.CsvCache(str(tmp_path / 'cache'), max_bytes=0)
+    cache.store(csv_files[0], pl.read_csv(csv_files[0]), {})
+    path = cache.path(csv_files[0], {})
+
+    csv_cache.CsvCache.hold([path])
+    try:
+        cache.evict()
+        cache.clear()
+        assert os.path.exists(path)
+    finally:
+        csv_cache.CsvCache.release([path])
+
+    cache.evict()
+    assert not os.path.exists(path)
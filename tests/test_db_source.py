@@ -0,0 +1,111 @@
+import sqlite3
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.db_source as db_source
+import Local_DB_Viwer.search_engine as search_engine
+import Local_DB_Viwer.table_source as table_source
+
+rows = 2_345
+
+def make_database(path, gaps=False, without_rowid=False) -> str:
+    """
+    Table of people, rowids with gaps when rows were deleted
+    """
+    connection = sqlite3.connect(path)
+    options = " WITHOUT ROWID" if without_rowid else ""
+    connection.execute(f"CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT, city TEXT, age INTEGER){options}")
+    cities = ['Oslo', 'Lima', 'Pune', None]
+    connection.executemany("INSERT INTO people VALUES (?, ?, ?, ?)",
+                           [(idx * 3 if gaps else idx + 1, f"Name {idx}", cities[idx % 4], idx % 90)
+                            for idx in range(rows)])
+    connection.execute("CREATE INDEX people_city ON people (city)")
+    connection.commit()
+    connection.close()
+    return str(path)
+
+@pytest.fixture(params=['contiguous', 'gaps', 'without_rowid'])
+def source(request, tmp_path) -> db_source.SQLiteSource:
+    path = make_database(tmp_path / 'people.db', request.param == 'gaps', request.param == 'without_rowid')
+    source = db_source.SQLiteSource(path, 'people')
+    yield source
+    db_source.close_engine(path)
+
+def test_pages(source) -> None:
+    """
+    Pages read the table in rowid order with the row number as Index, pages past the end are empty
+    """
+    table = source.column_frame(source.columns)
+    assert source.height == rows and table.height == rows
+    assert table['Index'].to_list() == list(range(rows))
+
+    for page in (3, 0, rows // source.page_rows, 1):
+        df = source.page(page).drop('__rowid')
+        assert df.equals(table.slice(page * source.page_rows, source.page_rows))
+    assert source.page(rows // source.page_rows + 1).height == 0
+    assert source.slice(rows - 5, 10).height == 5
+
+    positions = np.array([rows - 1, 0, 1_234, 17, 1_234])
+    assert source.gather(positions).equals(table[positions])
+
+def test_scattered_gather(source, monkeypatch) -> None:
+    """
+    Rows spread over many pages are looked up by rowid in batches, in the order asked for
+    """
+    monkeypatch.setattr(source, 'gather_batch', 100)
+    monkeypatch.setattr(source, 'max_pages', 2)
+    table = source.column_frame(source.columns)
+    positions = np.random.default_rng(3).permutation(rows)[:700]
+    positions = np.concatenate([positions, positions[:10]])
+    assert source.gather(positions).equals(table[positions])
+    assert source.gather(positions, ['age', 'Index']).equals(table[positions].select('age', 'Index'))
+    assert list(source._pages) == [0] or not source.has_rowid
+
+@pytest.mark.parametrize('text', [
+    "city = oslo", "age > 80 and city in (lima, pune)", "not city = oslo", "city = null",
+    "name like name 1%", "Index between 100 and 120", "Index > 2300 or age = 3", "Index in (0, 5, 2344)",
+    "Index != 7 and age < 2", "Index like 1%",
+])
+def test_search_matches_frame(source, text) -> None:
+    """
+    Searches run inside SQLite match the same rows and hits as the loaded table
+    """
+    frame = table_source.FrameSource(source.column_frame(source.columns))
+    pushed, loaded = search_engine.evaluate(source, text), search_engine.evaluate(frame, text)
+    assert np.array_equal(pushed.rows, loaded.rows)
+    for column, hits in loaded.hits.items():
+        assert np.array_equal(pushed.hits[column], hits)
+
+@pytest.mark.parametrize('text, mode', [("NAME 12", 'text'), ("^name 1.3$", 'regex')])
+def test_text_search_matches_frame(source, text, mode) -> None:
+    frame = table_source.FrameSource(source.column_frame(source.columns))
+    pushed = search_engine.evaluate(source, text, mode, ['name', 'city'])
+    loaded = search_engine.evaluate(frame, text, mode, ['name', 'city'])
+    assert np.array_equal(pushed.rows, loaded.rows)
+
+def test_lazy_scan(source, monkeypatch) -> None:
+    """
+    The chunked scan of the table reads the same rows and applies filters per chunk
+    """
+    monkeypatch.setattr(source, 'chunk_rows', 500)
+    table = source.column_frame(source.columns)
+    assert source.lazy().collect().equals(table)
+    assert source.lazy().filter(pl.col('age') == 5).collect().equals(table.filter(pl.col('age') == 5))
+    assert source.lazy().head(3).collect().equals(table.head(3))
+
+def test_cancelled_search(source) -> None:
+    """
+    A cancelled search is interrupted inside SQLite
+    """
+    token = search_engine.CancelToken()
+    token.cancel()
+    with pytest.raises(search_engine.SearchCancelled):
+        search_engine.evaluate(source, "name like %9%", token=token)
+    assert search_engine.run_request(source, search_engine.SearchRequest("name like %9%"), token=token) is None
+    assert search_engine.evaluate(source, "age = 1").count == len(range(1, rows, 90))
+
+def test_errors_are_query_errors(source) -> None:
+    with pytest.raises(search_engine.query_parser.QueryError):
+        search_engine.evaluate(source, "name ~ 3")
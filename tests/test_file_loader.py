@@ -0,0 +1,98 @@
+import threading
+import time
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.file_loader as file_loader
+
+@pytest.fixture
+def csv_files(tmp_path) -> list:
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"table{idx}.csv"
+        pl.DataFrame({'a': list(range(100)), 'b': [f"v{idx}"] * 100}).write_csv(path)
+        paths.append(str(path))
+    return paths
+
+def connect(loader) -> dict:
+    """
+    Record what the loader emits
+    """
+    emitted = {'tables': [], 'finished': [], 'failed': []}
+    loader.table_loaded.connect(lambda df, name: emitted['tables'].append((df, name)))
+    loader.file_finished.connect(lambda done, total: emitted['finished'].append((done, total)))
+    loader.file_failed.connect(lambda path, message: emitted['failed'].append(path))
+    return emitted
+
+def test_progress_and_failures(tmp_path, csv_files) -> None:
+    """
+    Every file reports its progress, a file that can not be read is reported and shown as an empty table
+    """
+    broken = tmp_path / 'broken.csv'
+    broken.write_bytes(b'a,b\n\xff\xfe,1\n')
+    loader = file_loader.FileLoader(csv_files + [str(broken)])
+    emitted = connect(loader)
+    loader.run()
+
+    assert emitted['finished'] == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    assert emitted['failed'] == [str(broken)]
+    tables = dict((name, df) for df, name in emitted['tables'])
+    assert sorted(tables) == ['broken', 'table0', 'table1', 'table2']
+    assert tables['table1'].equals(file_loader.add_index(pl.read_csv(csv_files[1])))
+    assert tables['broken'].is_empty()
+
+@pytest.fixture
+def slow_read(monkeypatch) -> tuple:
+    """
+    Reads that block until released, with an event set once a read has started
+    """
+    started, release = threading.Event(), threading.Event()
+    read_csv = file_loader.read_csv
+
+    def slowed(*args, **kwargs) -> list:
+        started.set()
+        release.wait(5)
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(file_loader, 'read_csv', slowed)
+    yield started, release
+    release.set()
+
+def test_cancel_while_parsing(csv_files, slow_read) -> None:
+    """
+    A cancel is noticed while files are still being parsed, their results are dropped once they finish
+    """
+    started, release = slow_read
+    loader = file_loader.FileLoader(csv_files)
+    loader.max_workers = 1
+    emitted = connect(loader)
+    worker = threading.Thread(target=loader.run)
+    worker.start()
+
+    assert started.wait(5)
+    loader.cancel()
+    began = time.monotonic()
+    worker.join(5)
+    assert not worker.is_alive()
+    assert time.monotonic() - began < 1
+
+    release.set()
+    time.sleep(3 * loader.poll_interval)
+    assert emitted == {'tables': [], 'finished': [], 'failed': []}
+
+def test_late_results_dropped(csv_files, monkeypatch) -> None:
+    """
+    A file that finishes parsing after a cancel hands back no tables
+    """
+    loader = file_loader.FileLoader(csv_files)
+    read_csv = file_loader.read_csv
+
+    def cancelled_while_reading(*args, **kwargs) -> list:
+        tables = read_csv(*args, **kwargs)
+        loader.cancel()
+        return tables
+
+    monkeypatch.setattr(file_loader, 'read_csv', cancelled_while_reading)
+    assert loader.load_file(csv_files[0]) == []
+    assert loader.load_file(csv_files[1]) == []
@@ -0,0 +1,41 @@
+import numpy as np
+
+# Local import
+import Local_DB_Viwer.highlight as highlight
+
+def test_from_rows() -> None:
+    """
+    Matched rows of each column read back from the packed bitmaps
+    """
+    mask = highlight.HighlightMask.from_rows(20, {'a': np.array([0, 7, 8, 19]), 'b': np.array([], dtype=np.int64)})
+    assert np.array_equal(mask.rows('a'), [0, 7, 8, 19])
+    assert len(mask.rows('b')) == 0
+    assert mask.contains(7, 'a') and mask.contains(19, 'a')
+    assert not mask.contains(6, 'a') and not mask.contains(20, 'a') and not mask.contains(-1, 'a')
+    assert not mask.contains(0, 'missing')
+    assert mask.columns() == ['a', 'b'] and not mask.is_empty()
+
+def test_set_rows_adds_blocks() -> None:
+    """
+    Blocks of hits added one after another end up the same as marking every row at once,
+    rows outside the table are dropped
+    """
+    height = 100_003
+    rng = np.random.default_rng(5)
+    mask = highlight.HighlightMask(height)
+    expected = np.zeros(height, dtype=bool)
+    for start in range(0, height, 7_000):
+        rows = rng.integers(start - 10, start + 9_000, 300)
+        mask.set_rows('a', rows)
+        expected[rows[(rows >= 0) & (rows < height)]] = True
+    mask.set_rows('a', [height - 1])
+    expected[height - 1] = True
+
+    assert np.array_equal(mask.rows('a'), np.flatnonzero(expected))
+    assert all(mask.contains(row, 'a') == expected[row] for row in rng.integers(0, height, 1_000))
+
+def test_empty_mask() -> None:
+    mask = highlight.HighlightMask(10)
+    assert mask.is_empty()
+    mask.set_rows('a', [])
+    assert mask.columns() == ['a'] and len(mask.rows('a')) == 0
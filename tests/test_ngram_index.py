@@ -0,0 +1,53 @@
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.ngram_index as ngram_index
+
+def make_column(rows=5_000, seed=0) -> pl.Series:
+    """
+    Text column with repeated values, short values and nulls
+    """
+    rng = np.random.default_rng(seed)
+    words = ['Alpha', 'beta', 'GAMMA ray', 'delta', 'ab', 'x', '', 'alphabet soup', 'Beta-Carotene', 'zeta']
+    values = [None if rng.random() < 0.05 else f"{words[rng.integers(len(words))]}{rng.integers(30)}"
+              for _ in range(rows)]
+    return pl.Series('text', values)
+
+def brute_force(series, text, regex=False) -> np.ndarray:
+    pattern = f"(?i){text}" if regex else text.lower()
+    column = series if regex else series.str.to_lowercase()
+    return np.flatnonzero(column.str.contains(pattern, literal=not regex).fill_null(False).to_numpy())
+
+@pytest.mark.parametrize('text', ['alpha', 'ALPHA1', 'ta', 'a', 'beta-c', 'ray2', 'soup', 'zz', 'eta', 'p', '1'])
+def test_search_matches_scan(text) -> None:
+    """
+    Substring lookups through the trigram index find exactly the rows a scan finds, short text included
+    """
+    series = make_column()
+    index = ngram_index.TrigramIndex.build(series)
+    assert np.array_equal(index.search(text), brute_force(series, text))
+
+@pytest.mark.parametrize('pattern', ['^alpha[0-9]$', 'ta2[0-5]', 'b.t', '^$'])
+def test_regex_matches_scan(pattern) -> None:
+    """
+    Regex lookups check the distinct values and find the rows a scan finds
+    """
+    series = make_column(seed=1)
+    index = ngram_index.TrigramIndex.build(series)
+    assert np.array_equal(index.search(pattern, regex=True), brute_force(series, pattern, regex=True))
+
+def test_many_matching_values() -> None:
+    """
+    Lookups matching many distinct values flag the rows instead of joining the runs
+    """
+    series = pl.Series('text', [f"row {i}" for i in range(3_000)] + [None])
+    index = ngram_index.TrigramIndex.build(series)
+    assert np.array_equal(index.search('row'), np.arange(3_000))
+    assert np.array_equal(index.search('w 1'), brute_force(series, 'w 1'))
+
+def test_empty_and_all_null() -> None:
+    for series in (pl.Series('text', [], dtype=pl.String), pl.Series('text', [None, None], dtype=pl.String)):
+        index = ngram_index.TrigramIndex.build(series)
+        assert len(index.search('abc')) == 0
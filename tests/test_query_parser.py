@@ -0,0 +1,101 @@
+import sqlite3
+import datetime
+import pytest
+import polars as pl
+
+# Local import
+import Local_DB_Viwer.query_parser as query_parser
+import Local_DB_Viwer.db_source as db_source
+
+table = pl.DataFrame({
+    'name': ['Ann', 'bob', None, 'Carl', 'ann marie', 'Dee'],
+    'age': [31, 45, 27, None, 31, 60],
+    'score': [1.5, 2.0, None, 3.25, 0.5, 2.0],
+    'joined': [datetime.date(2020, 1, 5), datetime.date(2021, 6, 1), None,
+               datetime.date(2019, 3, 9), datetime.date(2020, 1, 5), datetime.date(2022, 12, 31)],
+})
+
+@pytest.mark.parametrize('text, expected', [
+    ("age > 30", "Condition('age' > 30)"),
+    ("age >= 30 and name = ann", "BoolOp(and, [Condition('age' >= 30), Condition('name' = 'ann')])"),
+    ("a = 1 or b = 2 and c = 3",
+     "BoolOp(or, [Condition('a' = 1), BoolOp(and, [Condition('b' = 2), Condition('c' = 3)])])"),
+    ("(a = 1 or b = 2) & c = 3",
+     "BoolOp(and, [BoolOp(or, [Condition('a' = 1), Condition('b' = 2)]), Condition('c' = 3)])"),
+    ("not a = 1", "Not(Condition('a' = 1))"),
+    ("name in (ann, 'bob smith', 3)", "Condition('name' in ['ann', 'bob smith', 3])"),
+    ("age between 20 and 40", "Condition('age' between (20, 40))"),
+    ("joined = 2020-01-05", "Condition('joined' = datetime.date(2020, 1, 5))"),
+    ("`first name` == \"Ann\"", "Condition('first name' = 'Ann')"),
+    ("name like an%", "Condition('name' like 'an%')"),
+    ("score = null", "Condition('score' = None)"),
+])
+def test_parse(text, expected) -> None:
+    """
+    Search text parses into the expected condition tree, keywords are read in any case
+    """
+    node = query_parser.parse(text)
+    assert repr(node) == expected
+    assert repr(query_parser.parse(text.replace(' and ', ' AND ').replace(' or ', ' OR '))) == expected
+
+@pytest.mark.parametrize('text', ["age >", "(age > 1", "age > 1 and", "= 5", "age ! 5", "name in (a, b"])
+def test_parse_errors(text) -> None:
+    """
+    Half typed queries raise a QueryError
+    """
+    with pytest.raises(query_parser.QueryError):
+        query_parser.parse(text)
+
+def test_not_inverts_conditions() -> None:
+    """
+    Conditions under `not` are flipped for highlighting, comparisons flip their operator
+    """
+    conditions = query_parser.parse("not (age > 30 or name like a%)").conditions()
+    assert [(cond.op, cond.negate) for cond in conditions] == [('<=', False), ('like', True)]
+
+def polars_rows(text, mode='query', columns=()) -> list:
+    query = query_parser.compile_query(text, table.schema, False, mode, columns)
+    return table.with_row_index('__row').filter(query.expr)['__row'].to_list()
+
+def sqlite_rows(text, mode='query', columns=()) -> list:
+    query = query_parser.compile_query(text, table.schema, False, mode, columns)
+    connection = sqlite3.connect(':memory:')
+    db_source.add_functions(connection, None)
+    connection.execute("CREATE TABLE t (name TEXT, age INTEGER, score REAL, joined TEXT)")
+    connection.executemany("INSERT INTO t VALUES (?, ?, ?, ?)",
+                           [tuple(query_parser.sql_value(value) for value in row) for row in table.rows()])
+    where, params = query_parser.to_sql(query.node, {name: db_source.quote(name) for name in table.columns},
+                                        resolve=query.resolve)
+    found = connection.execute(f"SELECT rowid - 1 FROM t WHERE {where} ORDER BY rowid", params).fetchall()
+    return [row[0] for row in found]
+
+@pytest.mark.parametrize('text', [
+    "age > 30", "age >= 31 and score < 2", "name = ann", "name != ann", "NAME = ANN or age = 60",
+    "name in (ann, BOB)", "age not in (31, 45)", "age between 30 and 50", "not age between 30 and 50",
+    "name like an%", "name like %ar%", "name like _ob", "score = null", "score != null",
+    "joined >= 2020-01-05", "joined = 2020-01-05 and not name = ann", "not (age > 40 or name like c%)",
+])
+def test_sql_matches_polars(text) -> None:
+    """
+    The SQL a query turns into matches the same rows as its Polars filter
+    """
+    assert sqlite_rows(text) == polars_rows(text)
+
+@pytest.mark.parametrize('text, mode', [("ann", 'text'), ("AR", 'text'), ("^b.b$", 'regex'), ("a.n", 'regex')])
+def test_free_text_sql_matches_polars(text, mode) -> None:
+    """
+    Free text and regex searches match the same rows in SQLite and Polars
+    """
+    assert sqlite_rows(text, mode, ['name']) == polars_rows(text, mode, ['name'])
+
+def test_invalid_regex_sql() -> None:
+    """
+    A regex Python can not compile is reported before it reaches SQLite
+    """
+    query = query_parser.compile_query("(", table.schema, False, 'regex', ['name'])
+    with pytest.raises(query_parser.QueryError):
+        query_parser.to_sql(query.node, {'name': 'name'}, resolve=query.resolve)
+
+def test_unknown_column() -> None:
+    with pytest.raises(query_parser.QueryError):
+        query_parser.compile_query("height > 3", table.schema)
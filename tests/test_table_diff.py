@@ -0,0 +1,110 @@
+import sqlite3
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.db_source as db_source
+import Local_DB_Viwer.table_diff as table_diff
+import Local_DB_Viwer.table_source as table_source
+
+left = pl.DataFrame({
+    'index': [0, 1, 2, 3, 4, 5],
+    'id': ['a', 'b', 'c', 'd', 'e', 'f'],
+    'city': ['Oslo', 'Lima', 'Pune', None, 'Kyiv', 'Rome'],
+    'amount': [10, 20, 30, 40, 50, 60],
+})
+
+# Rows moved around: 'b' removed, 'g' added, 'c' city changed, 'd' amount and null city changed
+right = pl.DataFrame({
+    'index': [0, 1, 2, 3, 4, 5],
+    'id': ['f', 'g', 'a', 'e', 'd', 'c'],
+    'city': ['Rome', 'Bern', 'Oslo', 'Kyiv', 'Nice', 'Pisa'],
+    'amount': [60, 70, 10, 50, 41, 30],
+})
+
+@pytest.mark.parametrize('make', [table_source.FrameSource, lambda df: table_source.LazySource(df.lazy())])
+def test_diff(make) -> None:
+    """
+    Rows only on one side and the changed cells of the matched rows, on both sides
+    """
+    result = table_diff.diff(make(left), make(right), 'id')
+    assert result.removed.tolist() == [1]
+    assert result.added.tolist() == [1]
+    assert result.changed[0].tolist() == [2, 3] and result.changed[1].tolist() == [4, 5]
+    assert result.cells['city'][0].tolist() == [2, 3] and result.cells['city'][1].tolist() == [4, 5]
+    assert result.cells['amount'][0].tolist() == [3] and result.cells['amount'][1].tolist() == [4]
+    assert len(result.cells['id'][0]) == 0
+    assert 'index' not in result.cells
+    assert result.rows(0).tolist() == [1, 2, 3] and result.rows(1).tolist() == [1, 4, 5]
+
+def sqlite_source(path, df) -> db_source.SQLiteSource:
+    """
+    SQLite table holding the frame, with its columns lowercased like the viewer does
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE t (id TEXT, city TEXT, amount INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?, ?, ?)", df.select('id', 'city', 'amount').rows())
+    connection.commit()
+    connection.close()
+    source = db_source.SQLiteSource(str(path), 't')
+    return source.rename({column: column.lower() for column in source.columns})
+
+def test_tables_read_in_chunks(tmp_path, monkeypatch) -> None:
+    """
+    Scanned and SQLite tables are hashed from their scan and only the changed rows are read back,
+    the compared columns are never read whole
+    """
+    def whole_columns(self, columns):
+        raise AssertionError("Compared columns read whole")
+
+    monkeypatch.setattr(db_source.SQLiteSource, 'column_frame', whole_columns)
+    monkeypatch.setattr(table_source.LazySource, 'column_frame', whole_columns)
+    sources = [sqlite_source(tmp_path / 'left.db', left), table_source.LazySource(right.lazy())]
+    try:
+        result = table_diff.diff(*sources, 'id')
+    finally:
+        db_source.close_engine(sources[0].file_path)
+    assert result.removed.tolist() == [1] and result.added.tolist() == [1]
+    assert result.cells['city'][0].tolist() == [2, 3] and result.cells['amount'][1].tolist() == [4]
+
+def test_types_and_duplicates() -> None:
+    """
+    Columns typed differently are compared as text, repeated keys are matched on their first row
+    """
+    typed = right.with_columns(pl.col('amount').cast(pl.Int16), pl.col('city').cast(pl.Categorical))
+    repeated = pl.concat([left, left.head(1)])
+    result = table_diff.diff(table_source.FrameSource(repeated), table_source.FrameSource(typed), 'id')
+    assert result.duplicates == 1
+    assert result.changed[0].tolist() == [2, 3]
+    assert '1 repeated id values' in result.summary()
+
+def test_mask() -> None:
+    """
+    Highlights cover whole rows only on one side and the changed cells of the matched rows
+    """
+    result = table_diff.diff(table_source.FrameSource(left), table_source.FrameSource(right), 'id')
+    mask = result.mask(0, left.height, left.columns)
+    assert mask.rows('amount').tolist() == [1, 3]
+    assert mask.rows('city').tolist() == [1, 2, 3]
+    assert mask.rows('id').tolist() == [1]
+
+def test_changed_cells_in_chunks(monkeypatch) -> None:
+    """
+    Matched rows are compared a chunk at a time with the same result
+    """
+    rows = 10_000
+    a = pl.DataFrame({'id': np.arange(rows), 'v': np.arange(rows)})
+    b = a.with_columns(pl.when(pl.col('id') % 7 == 0).then(pl.col('v') + 1).otherwise(pl.col('v')).alias('v'))
+    b = b.sample(fraction=1.0, shuffle=True, seed=2)
+    monkeypatch.setattr(table_diff, 'chunk_rows', 333)
+    result = table_diff.diff(table_source.FrameSource(a), table_source.FrameSource(b), 'id')
+    assert np.array_equal(result.cells['v'][0], np.arange(0, rows, 7))
+    assert np.array_equal(np.sort(b['id'].to_numpy()[result.cells['v'][1]]), np.arange(0, rows, 7))
+
+def test_cancel() -> None:
+    """
+    A cancelled comparison stops with DiffCancelled
+    """
+    with pytest.raises(table_diff.DiffCancelled):
+        table_diff.diff(table_source.FrameSource(left), table_source.FrameSource(right), 'id', lambda: True)
@@ -0,0 +1,65 @@
+import datetime
+import numpy as np
+import polars as pl
+import pytest
+
+# Local import
+import Local_DB_Viwer.search_engine as search_engine
+import Local_DB_Viwer.table_source as table_source
+import Local_DB_Viwer.type_optimizer as type_optimizer
+
+rows = 1_000
+table = pl.DataFrame({
+    'small': [i % 100 for i in range(rows)],
+    'medium': [i * 100 - 50_000 for i in range(rows)],
+    'large': [i * 10 ** 10 for i in range(rows)],
+    'halves': [i / 2 for i in range(rows)],
+    'thirds': [i / 3 for i in range(rows)],
+    'repeated': [f"city {i % 5}" for i in range(rows)],
+    'unique': [f"name {i}" for i in range(rows)],
+    'dates': [(datetime.date(2020, 1, 1) + datetime.timedelta(days=i)).isoformat() for i in range(rows)],
+    'empty': pl.Series([None] * rows, dtype=pl.Int64),
+})
+
+def test_optimize_types() -> None:
+    """
+    Each column is stored in the smallest type holding all of its values
+    """
+    typed, before, after = type_optimizer.optimize(table.lazy())
+    schema = typed.collect_schema()
+    assert schema['small'] == pl.Int8
+    assert schema['medium'] == pl.Int32
+    assert schema['large'] == pl.Int64
+    assert schema['halves'] == pl.Float32
+    assert schema['thirds'] == pl.Float64
+    assert schema['repeated'] == pl.Categorical
+    assert schema['unique'] == pl.String
+    assert schema['dates'] == pl.Date
+    assert schema['empty'] == pl.Int64
+    assert 0 < after < before
+
+def test_values_kept() -> None:
+    """
+    Typing the columns keeps every value
+    """
+    typed = type_optimizer.optimize(table.lazy())[0].collect()
+    assert typed.with_columns(pl.col('repeated').cast(pl.String), pl.col('dates').cast(pl.String),
+                              pl.col(pl.Float32).cast(pl.Float64)).equals(table)
+
+@pytest.mark.parametrize('text, mode', [("2020-01-1", 'text'), ("^2021-.*-01$", 'regex')])
+def test_dates_searched_as_text(text, mode) -> None:
+    """
+    Free text searches find dates typed from text the same way as the text they came from
+    """
+    typed = table_source.FrameSource(type_optimizer.optimize(table.lazy())[0].collect())
+    loaded = table_source.FrameSource(table)
+    found = search_engine.evaluate(typed, text, mode, ['dates', 'unique'])
+    assert found.count and np.array_equal(found.rows, search_engine.evaluate(loaded, text, mode, ['dates', 'unique']).rows)
+
+def test_nothing_to_type() -> None:
+    """
+    Tables already in their smallest types are left alone
+    """
+    lazy = pl.DataFrame({'a': pl.Series([1, 2], dtype=pl.Int8)}).lazy()
+    assert type_optimizer.optimize(lazy) == (lazy, 0, 0)
+    assert 'saved about' in type_optimizer.report('t', 2 * 1024 ** 2, 1024 ** 2)